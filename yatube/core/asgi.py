@@ -0,0 +1,218 @@
+"""ASGI поверх Django 2.2, в котором своей поддержки ASGI ещё нет.
+
+WsgiToAsgi выполняет WSGI-приложение в пуле потоков, не блокируя цикл
+событий; ReadPoolWsgiToAsgi держит для чтений лент отдельный пул;
+Router отправляет запросы по префиксу пути в ASGI-приложения,
+например поток событий posts.events, а остальные — в Django.
+"""
+import asyncio
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.urls import Resolver404, resolve
+
+
+class RequestTooLarge(Exception):
+    """Тело запроса больше settings.ASGI_MAX_BODY_SIZE."""
+
+
+def wsgi_string(value):
+    """Строка environ по PEP 3333: байты UTF-8, прочитанные как latin-1.
+
+    Путь в scope ASGI уже раскодирован из %XX, поэтому повторный
+    unquote не нужен.
+    """
+    return value.encode('utf-8').decode('latin-1')
+
+
+def build_environ(scope, body):
+    """WSGI environ для HTTP-запроса ASGI."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': wsgi_string(scope.get('root_path', '')),
+        'PATH_INFO': wsgi_string(scope['path']),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'REMOTE_ADDR': client[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE' or name == 'CONTENT_LENGTH':
+            key = name
+        else:
+            key = f'HTTP_{name}'
+        if key in environ:
+            value = f'{environ[key]},{value}'
+        environ[key] = value
+    return environ
+
+
+def content_length(scope):
+    """Заголовок Content-Length запроса, без него или битый — None."""
+    for name, value in scope.get('headers', []):
+        if name.lower() == b'content-length':
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    return None
+
+
+async def read_body(receive, limit):
+    """Тело запроса файлом: до FILE_UPLOAD_MAX_MEMORY_SIZE в памяти,
+    дальше на диске. None — клиент отключился; на теле больше limit
+    чтение прерывается RequestTooLarge."""
+    body = tempfile.SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+    )
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            body.close()
+            return None
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > limit:
+            body.close()
+            raise RequestTooLarge
+        body.write(chunk)
+        if not message.get('more_body'):
+            body.seek(0)
+            return body
+
+
+class WsgiToAsgi:
+    """Выполняет WSGI-приложение в потоках пула executor.
+
+    Ответ собирается целиком: потоковые ответы Django здесь
+    не нужны, медиа и статику отдаёт веб-сервер.
+    """
+
+    def __init__(self, wsgi_application, executor=None):
+        self.wsgi_application = wsgi_application
+        self.executor = executor or ThreadPoolExecutor()
+
+    def run(self, environ):
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [
+                (name.lower().encode('latin-1'), value.encode('latin-1'))
+                for name, value in headers
+            ]
+
+        result = self.wsgi_application(environ, start_response)
+        try:
+            body = b''.join(result)
+        finally:
+            # close() шлёт request_finished: Django закрывает соединения.
+            if hasattr(result, 'close'):
+                result.close()
+        return response['status'], response['headers'], body
+
+    def executor_for(self, scope):
+        return self.executor
+
+    async def respond(self, send, status, headers, body):
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def __call__(self, scope, receive, send):
+        # Тело собирается до вызова Django, поэтому его размер
+        # ограничивается здесь, а не обработчиками загрузок.
+        limit = settings.ASGI_MAX_BODY_SIZE
+        length = content_length(scope)
+        try:
+            if length is not None and length > limit:
+                raise RequestTooLarge
+            body = await read_body(receive, limit)
+        except RequestTooLarge:
+            await self.respond(
+                send, 413, [(b'content-type', b'text/plain')],
+                b'Request Entity Too Large',
+            )
+            return
+        if body is None:
+            return
+        try:
+            response = await asyncio.get_running_loop().run_in_executor(
+                self.executor_for(scope), self.run,
+                build_environ(scope, body),
+            )
+        finally:
+            body.close()
+        await self.respond(send, *response)
+
+
+class ReadPoolWsgiToAsgi(WsgiToAsgi):
+    """WsgiToAsgi с отдельным пулом read_executor для чтений.
+
+    GET и HEAD к view с отметкой read_only (core.db.read_only_view)
+    выполняются в read_executor, всё остальное — в executor. Медленные
+    ленты занимают только свои потоки, и запись с формами не ждёт
+    в очереди за ними. Django 2.2 не умеет асинхронных view и ORM,
+    поэтому запросы к базе и шаблоны остаются синхронными в потоках,
+    а цикл событий только принимает и отдаёт ответы.
+    """
+
+    read_methods = ('GET', 'HEAD')
+
+    def __init__(self, wsgi_application, read_executor, executor=None):
+        super().__init__(wsgi_application, executor)
+        self.read_executor = read_executor
+
+    def executor_for(self, scope):
+        if scope['method'] not in self.read_methods:
+            return self.executor
+        try:
+            match = resolve(scope['path'])
+        except Resolver404:
+            return self.executor
+        if getattr(match.func, 'read_only', False):
+            return self.read_executor
+        return self.executor
+
+
+class Router:
+    """Выбирает ASGI-приложение по префиксу пути HTTP-запроса.
+
+    routes — пары (префикс, приложение), default получает остальное.
+    Сообщения lifespan подтверждаются здесь же.
+    """
+
+    def __init__(self, routes, default):
+        self.routes = routes
+        self.default = default
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            while True:
+                message = await receive()
+                if message['type'] == 'lifespan.startup':
+                    await send({'type': 'lifespan.startup.complete'})
+                elif message['type'] == 'lifespan.shutdown':
+                    await send({'type': 'lifespan.shutdown.complete'})
+                    return
+        if scope['type'] != 'http':
+            return
+        for prefix, application in self.routes:
+            if scope['path'].startswith(prefix):
+                return await application(scope, receive, send)
+        return await self.default(scope, receive, send)
@@ -0,0 +1,94 @@
+"""SQLite с необязательным пулом соединений.
+
+Ключ POOL_SIZE в настройках базы задаёт, сколько закрытых соединений
+процесс держит открытыми для повторного использования. Так соединения
+переживают потоки, которые живут один запрос (runserver, пулы потоков
+с перезапуском), где CONN_MAX_AGE не помогает. POOL_SIZE=0 отключает
+пул, и бэкенд ведёт себя как django.db.backends.sqlite3.
+"""
+import queue
+import sqlite3
+import threading
+
+from django.db.backends.sqlite3 import base
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, settings_dict):
+    """Очередь свободных соединений базы alias; None без пула.
+
+    Пул у каждого псевдонима свой: соединения к одному файлу могут
+    отличаться PRAGMA, например query_only у баз только для чтения.
+    """
+    size = settings_dict.get('POOL_SIZE') or 0
+    if size <= 0:
+        return None
+    key = (alias, settings_dict['NAME'], size)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = queue.LifoQueue(size)
+        return _pools[key]
+
+
+def clear_pools():
+    """Закрывает все свободные соединения пулов."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        while True:
+            try:
+                pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+def ping(raw_connection):
+    try:
+        raw_connection.execute('SELECT 1').close()
+    except sqlite3.Error:
+        return False
+    return True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def pool(self):
+        if self.is_in_memory_db():
+            return None
+        return get_pool(self.alias, self.settings_dict)
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool()
+        while pool is not None:
+            try:
+                raw_connection = pool.get_nowait()
+            except queue.Empty:
+                break
+            if (not self.settings_dict.get('CONN_HEALTH_CHECKS')
+                    or ping(raw_connection)):
+                return raw_connection
+            raw_connection.close()
+        return super().get_new_connection(conn_params)
+
+    def is_usable(self):
+        return ping(self.connection)
+
+    def _close(self):
+        pool = self.pool()
+        if pool is None or self.connection is None:
+            return super()._close()
+        try:
+            if self.connection.in_transaction:
+                self.connection.rollback()
+        except sqlite3.Error:
+            pass
+        if ping(self.connection):
+            try:
+                pool.put_nowait(self.connection)
+                return
+            except queue.Full:
+                pass
+        with self.wrap_database_errors:
+            self.connection.close()
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Инвалидация страниц, версии тегов для ETag, лимиты запросов
+    и статистика держатся на общем кэше: LocMemCache у каждого процесса
+    свой, и с несколькими воркерами они расходятся."""
+    return [
+        Warning(
+            f'Кэш {alias!r} хранится в памяти процесса.',
+            hint=('Запускайте один процесс или задайте общий бэкенд '
+                  'через YATUBE_CACHE_BACKEND и YATUBE_CACHE_LOCATION.'),
+            id='core.W001',
+        )
+        for alias, config in settings.CACHES.items()
+        if config['BACKEND'] in LOCAL_CACHES
+    ]
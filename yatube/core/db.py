@@ -0,0 +1,140 @@
+import random
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+from .stats import incr_counter, read_counters
+
+read_database = ContextVar('read_database', default=None)
+
+PIN_SESSION_KEY = 'pin_primary_until'
+ROUTE_STATS_KEY = 'db_route_stats:{}'
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Выполняет PRAGMA из ключа PRAGMAS настроек базы для каждого
+    нового соединения SQLite."""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = connection.settings_dict.get('PRAGMAS', {})
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def check_connections(**kwargs):
+    """Перед запросом закрывает сохранённые с прошлых запросов
+    соединения, которые не отвечают, если у базы включён
+    CONN_HEALTH_CHECKS: запрос откроет новое вместо ошибки."""
+    for conn in connections.all():
+        if (conn.connection is not None
+                and conn.settings_dict.get('CONN_HEALTH_CHECKS')
+                and not conn.is_usable()):
+            conn.close()
+
+
+def is_pinned(request):
+    """Пишет ли пользователь недавно: тогда реплики могут отставать
+    от его собственных изменений."""
+    session = getattr(request, 'session', None)
+    if session is None or PIN_SESSION_KEY not in session:
+        return False
+    return session[PIN_SESSION_KEY] > time.time()
+
+
+def routing_stats():
+    """Сколько запросов read_only_view ушло в каждую базу.
+
+    pinned — запросы, оставленные на default из-за недавней записи.
+    """
+    routes = ['pinned', *settings.READ_DATABASES]
+    values = read_counters([ROUTE_STATS_KEY.format(r) for r in routes])
+    return {
+        route: values[ROUTE_STATS_KEY.format(route)] for route in routes
+    }
+
+
+def reset_routing_stats():
+    routes = ['pinned', *settings.READ_DATABASES]
+    cache.delete_many([ROUTE_STATS_KEY.format(r) for r in routes])
+
+
+def choose_read_database(request):
+    if not settings.READ_DATABASES:
+        return None
+    if is_pinned(request):
+        incr_counter(ROUTE_STATS_KEY.format('pinned'))
+        return None
+    alias = random.choice(settings.READ_DATABASES)
+    incr_counter(ROUTE_STATS_KEY.format(alias))
+    return alias
+
+
+def read_from_replica(request):
+    """Читал ли запрос из реплики в другом файле, которая может отставать
+    от default. Базы только для чтения к тому же файлу не отстают."""
+    alias = getattr(request, 'read_database', None)
+    if alias is None:
+        return False
+    return (settings.DATABASES[alias]['NAME']
+            != settings.DATABASES['default']['NAME'])
+
+
+def read_only_view(view):
+    """Направляет чтения внутри view в одну из settings.READ_DATABASES.
+
+    Запись по-прежнему идёт в default. Пользователь, который недавно
+    писал (pin_primary), читает из default. Без READ_DATABASES
+    декоратор ничего не меняет. Выбранная база остаётся
+    в request.read_database для декораторов выше.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        alias = choose_read_database(request)
+        if alias is None:
+            return view(request, *args, **kwargs)
+        request.read_database = alias
+        token = read_database.set(alias)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            read_database.reset(token)
+    # По отметке core.asgi отправляет view в пул потоков для чтения;
+    # wraps в декораторах выше переносит её на итоговую функцию.
+    wrapper.read_only = True
+    return wrapper
+
+
+def pin_primary(view):
+    """Оставляет чтения пользователя на default REPLICA_PIN_SECONDS
+    секунд после вызова view, которая пишет в базу."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if settings.READ_DATABASES and hasattr(request, 'session'):
+            request.session[PIN_SESSION_KEY] = (
+                time.time() + settings.REPLICA_PIN_SECONDS
+            )
+        return response
+    return wrapper
+
+
+class ReadOnlyViewRouter:
+    """Роутер для read_only_view: чтения — в базу из контекста,
+    запись и миграции — только в default."""
+
+    def db_for_read(self, model, **hints):
+        return read_database.get()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == 'default'
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from core.db import reset_routing_stats, routing_stats
+from core.stats import require_shared_cache
+
+
+class Command(BaseCommand):
+    help = 'Показывает, сколько чтений вьюх лент ушло в каждую базу.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true', help='Обнулить счётчики.'
+        )
+
+    def handle(self, *args, **options):
+        require_shared_cache()
+        stats = routing_stats()
+        total = sum(stats.values())
+        for route, count in stats.items():
+            share = count / total if total else 0.0
+            self.stdout.write(f'{route}: {count} ({share:.1%})')
+        if options['reset']:
+            reset_routing_stats()
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from core.ratelimit import rate_limit_stats, reset_rate_limit_stats
+from core.stats import require_shared_cache
+
+
+class Command(BaseCommand):
+    help = ('Показывает, сколько запросов к ограниченным view '
+            'пропущено и отклонено.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true', help='Обнулить счётчики.'
+        )
+
+    def handle(self, *args, **options):
+        require_shared_cache()
+        for scope, stats in rate_limit_stats().items():
+            self.stdout.write(
+                f'{scope}: пропущено {stats["allowed"]}, '
+                f'отклонено {stats["rejected"]}'
+            )
+        if options['reset']:
+            reset_rate_limit_stats()
@@ -0,0 +1,32 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную базу SQLite в файлы реплик из '
+            'settings.READ_DATABASES для локальной проверки роутинга.')
+
+    def handle(self, *args, **options):
+        # ENGINE бывает и своим бэкендом поверх SQLite (core.backends).
+        primary = connections['default']
+        if primary.vendor != 'sqlite':
+            raise CommandError('Команда копирует только базы SQLite.')
+        replicas = [
+            settings.DATABASES[alias]['NAME']
+            for alias in settings.READ_DATABASES
+            if settings.DATABASES[alias]['NAME']
+            != primary.settings_dict['NAME']
+        ]
+        primary.ensure_connection()
+        for name in replicas:
+            # backup() снимает согласованную копию и при записи
+            # в основную базу во время копирования.
+            target = sqlite3.connect(name)
+            try:
+                primary.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(f'Реплика обновлена: {name}')
@@ -0,0 +1,102 @@
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from .stats import incr_counter, read_counters
+
+BUCKET_KEY = 'rate_bucket:{}:{}'
+STATS_KEY = 'rate_stats:{}:{}'
+
+# Ведро читается и пишется парой get/set: блокировка делает это атомарным
+# внутри процесса, между процессами возможен лишний пропущенный запрос.
+_lock = threading.Lock()
+
+
+def client_id(request):
+    """Пользователь из сессии без запроса к таблице пользователей,
+    для анонимов — IP-адрес."""
+    session = getattr(request, 'session', None)
+    user_id = session.get(SESSION_KEY) if session is not None else None
+    if user_id is not None:
+        return f'user:{user_id}'
+    return f'ip:{request.META.get("REMOTE_ADDR", "")}'
+
+
+def take_token(key, burst, period):
+    """Забирает токен из ведра ёмкостью burst, которое наполняется
+    целиком за period секунд.
+
+    Возвращает 0, если токен был, иначе сколько секунд ждать следующего.
+    """
+    rate = burst / period
+    now = time.time()
+    with _lock:
+        tokens, updated = cache.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        # За period простоя ведро наполняется, хранить его дольше незачем.
+        cache.set(key, (tokens, now), period)
+    return 0 if allowed else (1 - tokens) / rate
+
+
+def rate_limit_stats():
+    """Пропущенные и отклонённые запросы по областям RATE_LIMITS."""
+    keys = {
+        (scope, outcome): STATS_KEY.format(scope, outcome)
+        for scope in settings.RATE_LIMITS
+        for outcome in ('allowed', 'rejected')
+    }
+    values = read_counters(list(keys.values()))
+    stats = {scope: {} for scope in settings.RATE_LIMITS}
+    for (scope, outcome), key in keys.items():
+        stats[scope][outcome] = values[key]
+    return stats
+
+
+def reset_rate_limit_stats():
+    cache.delete_many([
+        STATS_KEY.format(scope, outcome)
+        for scope in settings.RATE_LIMITS
+        for outcome in ('allowed', 'rejected')
+    ])
+
+
+def rate_limit(scope, methods=('POST',)):
+    """Ограничивает частоту запросов к view ведром токенов на клиента.
+
+    Лимит берётся из settings.RATE_LIMITS[scope] как (burst, period).
+    Декоратор ставится над login_required: лишний запрос отклоняется
+    ответом 429 до загрузки пользователя и любой записи в базу.
+    methods=None ограничивает запросы любым методом.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            limit = settings.RATE_LIMITS.get(scope)
+            if limit is None or (
+                methods is not None and request.method not in methods
+            ):
+                return view(request, *args, **kwargs)
+            wait = take_token(
+                BUCKET_KEY.format(scope, client_id(request)), *limit
+            )
+            if wait:
+                incr_counter(STATS_KEY.format(scope, 'rejected'))
+                response = HttpResponse(
+                    'Слишком много запросов, попробуйте позже.',
+                    content_type='text/plain; charset=utf-8',
+                    status=429,
+                )
+                response['Retry-After'] = str(int(wait) + 1)
+                return response
+            incr_counter(STATS_KEY.format(scope, 'allowed'))
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
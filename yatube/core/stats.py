@@ -0,0 +1,38 @@
+"""Счётчики статистики в кэше default.
+
+Их читают команды *_stats, а команда работает в своём процессе:
+с кэшем в памяти процесса (LocMemCache) она видела бы свой пустой
+кэш и нули, поэтому require_shared_cache() останавливает её ошибкой.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import CommandError
+
+from .checks import LOCAL_CACHES
+
+
+def incr_counter(key, delta=1):
+    """Прибавляет delta к бессрочному счётчику, заводя его при нужде."""
+    if not cache.add(key, delta, None):
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            # Счётчик вытеснили между add и incr.
+            cache.set(key, delta, None)
+
+
+def read_counters(keys):
+    """Значения счётчиков по ключам, недостающие — 0."""
+    values = cache.get_many(keys)
+    return {key: values.get(key, 0) for key in keys}
+
+
+def require_shared_cache():
+    """Для команд статистики: счётчики других процессов видны только
+    через общий бэкенд кэша."""
+    if settings.CACHES['default']['BACKEND'] in LOCAL_CACHES:
+        raise CommandError(
+            'Счётчики лежат в кэше процесса, отсюда они не видны. '
+            'Задайте общий кэш через YATUBE_CACHE_BACKEND '
+            'и YATUBE_CACHE_LOCATION.'
+        )
@@ -1,6 +1,7 @@
 from django.contrib import admin
 
 from .models import Group, Post
+from .search import search_posts
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -16,11 +17,18 @@ class PostAdmin(admin.ModelAdmin):
     search_fields = ("text",)
     empty_value_display = "-пусто-"
 
+    def get_search_results(self, request, queryset, search_term):
+        """Ищет по индексу поиска вместо LIKE по search_fields."""
+        if not search_term:
+            return queryset, False
+        return search_posts(queryset, search_term), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = (
         "title",
         "description",
+        "post_count",
     )
 
 
@@ -0,0 +1,232 @@
+"""JSON API только для чтения: те же ленты, что и в posts.views.
+
+Строки читаются через .values() без создания объектов моделей
+и отдаются компактным JSON, сжатым brotli (если установлен пакет
+brotli) или gzip.
+"""
+import re
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.http import Http404, JsonResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+from core.db import read_only_view
+
+from .models import Comment, Group, Post, User
+from .page_cache import conditional_page
+from .utils import CursorPaginator, TimelinePaginator
+from .views import (group_page_tags, index_page_tags, post_page_tags,
+                    profile_page_tags)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# В лентах нет comment_count: комментарий сбрасывает только тег поста,
+# и ETag ленты с устаревшим счётчиком отвечал бы 304.
+POST_FIELDS = (
+    'id', 'text', 'pub_date', 'updated', 'author__username', 'group__slug',
+    'image',
+)
+POST_DETAIL_FIELDS = POST_FIELDS + ('comment_count',)
+COMMENT_FIELDS = (
+    'id', 'text', 'pub_date', 'author__username', 'parent_id', 'depth',
+    'reply_count',
+)
+AUTHOR_FIELDS = (
+    'id', 'username', 'stats__posts', 'stats__followers', 'stats__following',
+)
+# Ответы короче этого не сжимаются: заголовки съедят выигрыш.
+MIN_COMPRESS_LENGTH = 200
+
+image_storage = Post._meta.get_field('image').storage
+
+
+def post_json(row):
+    return {
+        'id': row['id'],
+        'text': row['text'],
+        'pub_date': row['pub_date'],
+        'updated': row['updated'],
+        'author': row['author__username'],
+        'group': row['group__slug'],
+        'image': image_storage.url(row['image']) if row['image'] else None,
+    }
+
+
+def post_detail_json(row):
+    return {**post_json(row), 'comment_count': row['comment_count']}
+
+
+def comment_json(row):
+    return {
+        'id': row['id'],
+        'text': row['text'],
+        'pub_date': row['pub_date'],
+        'author': row['author__username'],
+        'parent': row['parent_id'],
+        'depth': row['depth'],
+        'reply_count': row['reply_count'],
+    }
+
+
+def author_json(row):
+    return {
+        'id': row['id'],
+        'username': row['username'],
+        'posts': row['stats__posts'],
+        'followers': row['stats__followers'],
+        'following': row['stats__following'],
+    }
+
+
+def page_json(request, rows, serialize, per_page=None, paginator=None):
+    """Страница строк по курсору ?cursor= со ссылками на соседние.
+
+    paginator заменяет CursorPaginator над rows, например для ленты
+    подписок.
+    """
+    if paginator is None:
+        paginator = CursorPaginator(rows, per_page or settings.NUMBER_POSTS)
+    page = paginator.get_page(request.GET.get('cursor'))
+
+    def link(cursor):
+        if cursor is None:
+            return None
+        return request.build_absolute_uri(
+            f'{request.path}?{urlencode({"cursor": cursor})}'
+        )
+
+    return {
+        'results': [serialize(row) for row in page],
+        'next': link(paginator.next_cursor),
+        'previous': link(paginator.previous_cursor),
+    }
+
+
+def api_response(data, status=200):
+    return JsonResponse(
+        data,
+        status=status,
+        json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')},
+    )
+
+
+def compressed(view):
+    """Сжимает ответ brotli или gzip по Accept-Encoding клиента.
+
+    ETag становится слабым, как в GZipMiddleware: сжатое тело
+    отличается побайтно, но представляет те же данные.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if (response.status_code != 200
+                or response.has_header('Content-Encoding')
+                or len(response.content) < MIN_COMPRESS_LENGTH):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accepted = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if brotli is not None and re.search(r'\bbr\b', accepted):
+            content, encoding = brotli.compress(response.content), 'br'
+        elif re.search(r'\bgzip\b', accepted):
+            content, encoding = compress_string(response.content), 'gzip'
+        else:
+            return response
+        if len(content) >= len(response.content):
+            return response
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        response['Content-Encoding'] = encoding
+        if response.has_header('ETag'):
+            response['ETag'] = re.sub(r'^"', 'W/"', response['ETag'])
+        return response
+    return wrapper
+
+
+@compressed
+@conditional_page(index_page_tags)
+@read_only_view
+def index(request):
+    return api_response(page_json(
+        request, Post.objects.feed().values(*POST_FIELDS), post_json
+    ))
+
+
+@compressed
+@conditional_page(group_page_tags)
+@read_only_view
+def group_posts(request, slug):
+    group = Group.objects.filter(slug=slug).values(
+        'id', 'title', 'slug', 'description', 'post_count'
+    ).first()
+    if group is None:
+        raise Http404
+    data = page_json(
+        request,
+        Post.objects.feed().filter(group_id=group['id']).values(
+            *POST_FIELDS
+        ),
+        post_json,
+    )
+    return api_response({'group': group, **data})
+
+
+@compressed
+@conditional_page(profile_page_tags)
+@read_only_view
+def profile(request, username):
+    author = User.objects.filter(username=username).values(
+        *AUTHOR_FIELDS
+    ).first()
+    if author is None:
+        raise Http404
+    data = page_json(
+        request,
+        Post.objects.profile().filter(author_id=author['id']).values(
+            *POST_FIELDS
+        ),
+        post_json,
+    )
+    return api_response({'author': author_json(author), **data})
+
+
+@compressed
+@conditional_page(post_page_tags)
+@read_only_view
+def post_detail(request, post_id):
+    """Пост и страница его комментариев всех уровней, новые первыми:
+    по parent и depth клиент сам собирает треды."""
+    post = Post.objects.filter(pk=post_id).values(
+        *POST_DETAIL_FIELDS
+    ).first()
+    if post is None:
+        raise Http404
+    comments = page_json(
+        request,
+        Comment.objects.filter(post_id=post_id).values(*COMMENT_FIELDS),
+        comment_json,
+        settings.COMMENTS_PER_PAGE,
+    )
+    return api_response({
+        'post': post_detail_json(post), 'comments': comments,
+    })
+
+
+@compressed
+@read_only_view
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return api_response({'detail': 'Нужна авторизация.'}, status=401)
+    paginator = TimelinePaginator(
+        Post.objects.feed().values(*POST_FIELDS),
+        request.user,
+        settings.NUMBER_POSTS,
+    )
+    return api_response(page_json(
+        request, None, post_json, paginator=paginator
+    ))
@@ -0,0 +1,125 @@
+"""Рассылка событий о новых постах подписчикам SSE (posts.events).
+
+Бэкенд задаётся settings.POST_BROADCAST_BACKEND. LocalBroadcast держит
+подписчиков в памяти процесса: публикует поток, обработавший запрос,
+а читают корутины цикла событий, поэтому страницы и события должен
+обслуживать один процесс — так и устроен yatube.asgi. Для нескольких
+процессов нужен бэкенд поверх общего брокера с тем же интерфейсом.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+
+def post_channels(post):
+    """Каналы, в которые попадает пост: общая лента, автор, группа."""
+    channels = ['posts', f'author:{post.author_id}']
+    if post.group_id:
+        channels.append(f'group:{post.group_id}')
+    return channels
+
+
+def post_message(post):
+    return {
+        'id': post.pk,
+        'author': post.author_id,
+        'group': post.group_id,
+        'card': reverse('posts:post_card', args=[post.pk]),
+    }
+
+
+class Subscription:
+    """Очередь событий одного клиента.
+
+    Медленный клиент не задерживает публикацию: при переполнении
+    очереди старые события отбрасываются.
+    """
+
+    def __init__(self, broadcast, channels, loop):
+        self.broadcast = broadcast
+        self.channels = channels
+        self.loop = loop
+        self.queue = asyncio.Queue(settings.POST_BROADCAST_QUEUE_SIZE)
+
+    def put(self, message):
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.broadcast.unsubscribe(self)
+
+
+class Broadcast:
+    def subscribe(self, channels):
+        """Подписка на каналы для текущего цикла событий."""
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        raise NotImplementedError
+
+    def publish(self, channel, message):
+        """Отправляет сообщение подписчикам канала; можно вызывать
+        из любого потока."""
+        raise NotImplementedError
+
+
+class LocalBroadcast(Broadcast):
+    """Подписчики в памяти процесса."""
+
+    def __init__(self):
+        self.subscribers = defaultdict(set)
+        self.lock = threading.Lock()
+
+    def subscribe(self, channels):
+        subscription = Subscription(
+            self, list(channels), asyncio.get_running_loop()
+        )
+        with self.lock:
+            for channel in subscription.channels:
+                self.subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            for channel in subscription.channels:
+                self.subscribers[channel].discard(subscription)
+                if not self.subscribers[channel]:
+                    del self.subscribers[channel]
+
+    def publish(self, channel, message):
+        with self.lock:
+            subscriptions = list(self.subscribers.get(channel, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(
+                    subscription.put, message
+                )
+            except RuntimeError:
+                # Цикл событий подписчика уже закрыт.
+                pass
+
+
+@lru_cache(maxsize=None)
+def load_backend(path):
+    return import_string(path)()
+
+
+def get_broadcast():
+    """Бэкенд из settings.POST_BROADCAST_BACKEND."""
+    return load_backend(settings.POST_BROADCAST_BACKEND)
+
+
+def publish_post(post):
+    message = post_message(post)
+    broadcast = get_broadcast()
+    for channel in post_channels(post):
+        broadcast.publish(channel, message)
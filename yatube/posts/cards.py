@@ -0,0 +1,85 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+from core.stats import incr_counter, read_counters
+
+from .page_cache import tag_versions
+from .thumbnails import ThumbnailBatch, has_placeholder
+
+CARD_KEY = 'post_card:{}:{}:{}'
+STATS_KEY = 'post_card_stats:{}'
+CARD_TEMPLATES = {
+    'feed': 'posts/includes/post_card.html',
+    'profile': 'posts/includes/profile_card.html',
+}
+
+
+class CardBatch:
+    """Карточки страницы, выбранные из кэша одним get_many.
+
+    Ключ карточки включает версию тега card:<id>, которую сигналы
+    меняют при правке поста, и версию тега groups. Миниатюры для
+    карточек, которых нет в кэше, читаются одним ThumbnailBatch.
+    """
+
+    def __init__(self, posts, variant='feed'):
+        self.variant = variant
+        posts = list(posts)
+        tags = [f'card:{post.pk}' for post in posts] + ['groups']
+        versions = tag_versions(tags)
+        groups_version = versions[-1]
+        self.keys = {
+            post.pk: CARD_KEY.format(
+                variant, post.pk,
+                hashlib.md5(
+                    f'{version}:{groups_version}'.encode()
+                ).hexdigest(),
+            )
+            for post, version in zip(posts, versions)
+        }
+        self.cards = cache.get_many(list(self.keys.values()))
+        record_hits(len(self.cards), len(self.keys) - len(self.cards))
+        self.thumbnails = ThumbnailBatch(
+            [post for post in posts if self.keys[post.pk] not in self.cards],
+            ['card'],
+        )
+
+    def render(self, post):
+        key = self.keys.get(post.pk)
+        if key in self.cards:
+            return self.cards[key]
+        card = render_to_string(CARD_TEMPLATES[self.variant], {
+            'post': post,
+            'post_thumbnails': self.thumbnails,
+        })
+        if key is not None and not has_placeholder(card):
+            cache.set(key, card, settings.POST_CARD_TIMEOUT)
+        return card
+
+
+def record_hits(hits, misses):
+    for name, value in (('hits', hits), ('misses', misses)):
+        if value:
+            incr_counter(STATS_KEY.format(name), value)
+
+
+def card_stats():
+    """Попадания и промахи кэша карточек с момента сброса."""
+    values = read_counters(
+        [STATS_KEY.format('hits'), STATS_KEY.format('misses')]
+    )
+    hits = values[STATS_KEY.format('hits')]
+    misses = values[STATS_KEY.format('misses')]
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'ratio': hits / total if total else 0.0,
+    }
+
+
+def reset_card_stats():
+    cache.delete_many([STATS_KEY.format('hits'), STATS_KEY.format('misses')])
@@ -0,0 +1,94 @@
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Concat
+
+FEED_COUNT_KEY = 'feed_count:{}:{}'
+
+
+def feed_key(kind, pk=''):
+    """Ключ счётчика ленты: index, group, author или follow."""
+    return FEED_COUNT_KEY.format(kind, pk)
+
+
+def post_feed_keys(post):
+    """Ключи всех лент, в которые попадает пост, кроме ленты подписок."""
+    keys = [feed_key('index'), feed_key('author', post.author_id)]
+    if post.group_id:
+        keys.append(feed_key('group', post.group_id))
+    return keys
+
+
+def get_feed_count(key, queryset):
+    """Число постов в ленте из кэша, при промахе считается один раз.
+
+    Значение живёт FEED_COUNT_TIMEOUT секунд, поэтому расхождение
+    с таблицей ограничено этим окном.
+    """
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, settings.FEED_COUNT_TIMEOUT)
+    return count
+
+
+def change_feed_counts(keys, delta):
+    """Сдвигает счётчики на delta, отсутствующие ключи пересчитаются сами."""
+    for key in keys:
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            pass
+
+
+def reset_feed_counts(keys):
+    cache.delete_many(keys)
+
+
+def _count_by(model, field, outer='pk'):
+    """Подзапрос COUNT(*) по внешнему ключу field для UPDATE ... SET."""
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef(outer)})
+        .order_by().values(field)
+        .annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def rebuild_counters(apps=django_apps):
+    """Пересчитывает денормализованные счётчики постов, комментариев,
+    ответов и подписок с нуля. apps позволяет вызывать функцию
+    из миграций."""
+    user_model = apps.get_model(settings.AUTH_USER_MODEL)
+    group_model = apps.get_model('posts', 'Group')
+    post_model = apps.get_model('posts', 'Post')
+    comment_model = apps.get_model('posts', 'Comment')
+    follow_model = apps.get_model('posts', 'Follow')
+    stats_model = apps.get_model('posts', 'AuthorStats')
+    with transaction.atomic():
+        missing = user_model.objects.filter(stats__isnull=True)
+        stats_model.objects.bulk_create(
+            stats_model(user_id=pk)
+            for pk in missing.values_list('pk', flat=True)
+        )
+        stats_model.objects.update(
+            posts=_count_by(post_model, 'author', 'user'),
+            followers=_count_by(follow_model, 'author', 'user'),
+            following=_count_by(follow_model, 'user', 'user'),
+        )
+        group_model.objects.update(post_count=_count_by(post_model, 'group'))
+        post_model.objects.update(
+            comment_count=_count_by(comment_model, 'post')
+        )
+        fields = {field.name for field in comment_model._meta.get_fields()}
+        # В миграциях до 0013 у комментариев ещё нет дерева ответов.
+        if 'reply_count' in fields:
+            comment_model.objects.update(reply_count=Coalesce(Subquery(
+                comment_model.objects.filter(
+                    post=OuterRef('post'),
+                    path__gt=OuterRef('path'),
+                    path__lt=Concat(OuterRef('path'), Value('~')),
+                ).order_by().values('post')
+                .annotate(total=Count('pk')).values('total')
+            ), 0))
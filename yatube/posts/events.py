@@ -0,0 +1,118 @@
+"""ASGI-приложение Server-Sent Events о новых постах.
+
+/events/ — общая лента, /events/group/<slug>/ — группа,
+/events/follow/ — авторы, на которых подписан пользователь сессии.
+Клиент получает id поста и адрес его карточки и запрашивает только её.
+"""
+import asyncio
+import json
+import re
+from http.cookies import SimpleCookie
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.db import close_old_connections
+
+from .broadcast import get_broadcast
+from .models import Follow, Group
+
+EVENTS_PREFIX = '/events/'
+GROUP_RE = re.compile(r'^group/(?P<slug>[-\w]+)/$')
+
+
+def session_user_id(scope):
+    """id пользователя из сессионной cookie запроса."""
+    cookies = SimpleCookie()
+    for name, value in scope.get('headers', []):
+        if name == b'cookie':
+            cookies.load(value.decode('latin-1'))
+    morsel = cookies.get(settings.SESSION_COOKIE_NAME)
+    if morsel is None:
+        return None
+    engine = import_module(settings.SESSION_ENGINE)
+    return engine.SessionStore(morsel.value).get(SESSION_KEY)
+
+
+def resolve_channels(scope):
+    """Каналы для пути запроса: (status, channels).
+
+    Выполняется в потоке: читает сессию и подписки из базы.
+    """
+    try:
+        route = scope['path'][len(EVENTS_PREFIX):]
+        if route == '':
+            return 200, ['posts']
+        match = GROUP_RE.match(route)
+        if match:
+            group = Group.objects.filter(
+                slug=match.group('slug')
+            ).values_list('pk', flat=True).first()
+            if group is None:
+                return 404, []
+            return 200, [f'group:{group}']
+        if route == 'follow/':
+            user_id = session_user_id(scope)
+            if user_id is None:
+                return 401, []
+            authors = Follow.objects.filter(
+                user_id=user_id
+            ).values_list('author_id', flat=True)
+            return 200, [f'author:{pk}' for pk in authors]
+        return 404, []
+    finally:
+        close_old_connections()
+
+
+def format_event(message):
+    return (
+        f'id: {message["id"]}\nevent: post\n'
+        f'data: {json.dumps(message, separators=(",", ":"))}\n\n'
+    ).encode()
+
+
+async def wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def application(scope, receive, send):
+    loop = asyncio.get_running_loop()
+    status, channels = await loop.run_in_executor(
+        None, resolve_channels, scope
+    )
+    if status != 200:
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(b'content-type', b'text/plain')]})
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+    subscription = get_broadcast().subscribe(channels)
+    disconnect = asyncio.ensure_future(wait_disconnect(receive))
+    try:
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ]})
+        await send({'type': 'http.response.body',
+                    'body': b'retry: 5000\n\n', 'more_body': True})
+        while not disconnect.done():
+            message = asyncio.ensure_future(subscription.get())
+            await asyncio.wait(
+                {message, disconnect},
+                timeout=settings.SSE_KEEPALIVE_SECONDS,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if message.done():
+                body = format_event(message.result())
+            else:
+                message.cancel()
+                # Комментарий не даёт прокси закрыть простаивающее
+                # соединение.
+                body = b': ping\n\n'
+            if not disconnect.done():
+                await send({'type': 'http.response.body', 'body': body,
+                            'more_body': True})
+    finally:
+        subscription.close()
+        disconnect.cancel()
@@ -1,6 +1,8 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
 from .models import Comment, Post
+from .uploads import check_pixels, strip_metadata
 
 
 class PostForm(forms.ModelForm):
@@ -12,6 +14,26 @@ class PostForm(forms.ModelForm):
         self.fields['group'].empty_label = (
             'Выберите группу 🙂'
         )
+        # Файл, отброшенный ImageUploadLimitHandler, не доходит
+        # до ImageField, а его причина становится ошибкой поля.
+        self.upload_error = getattr(
+            self.files.get('image'), 'upload_error', None
+        )
+        if self.upload_error:
+            self.files = self.files.copy()
+            del self.files['image']
+
+    def clean_image(self):
+        """Проверяет лимиты картинки и убирает из неё метаданные."""
+        if self.upload_error:
+            raise forms.ValidationError(self.upload_error)
+        image = self.cleaned_data['image']
+        if isinstance(image, UploadedFile):
+            error = check_pixels(*image.image.size)
+            if error:
+                raise forms.ValidationError(error)
+            image = strip_metadata(image)
+        return image
 
     class Meta:
         model = Post
@@ -0,0 +1,122 @@
+"""Общие помощники для команд-бенчмарков (bench_*).
+
+Команды работают во временной базе, созданной так же, как тестовая,
+поэтому рабочие данные не затрагиваются.
+"""
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.utils import timezone
+
+User = get_user_model()
+
+
+@contextmanager
+def scratch_database(verbosity=0, name=None):
+    """Создаёт временную базу со схемой проекта и удаляет её после.
+
+    name задаёт имя тестовой базы, например файл вместо SQLite в памяти.
+    """
+    old_name = connection.settings_dict['NAME']
+    old_test_name = connection.settings_dict['TEST'].get('NAME')
+    if name is not None:
+        connection.settings_dict['TEST']['NAME'] = name
+    connection.creation.create_test_db(
+        verbosity=verbosity, autoclobber=True, serialize=False
+    )
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity)
+        connection.settings_dict['TEST']['NAME'] = old_test_name
+
+
+def best_of(func, repeat=5):
+    """Лучшее время выполнения func в миллисекундах."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+
+def seed(posts, authors=1000, groups=50, comments=0, follows=100,
+         batch=10000, words=None):
+    """Быстро заполняет базу постами через executemany в обход ORM.
+
+    words — словарь, из которого собираются тексты постов и комментариев.
+    Возвращает (читатель, группа, автор, пост) для запросов бенчмарка.
+    """
+    rng = random.Random(0)
+
+    def text(default):
+        if not words:
+            return default
+        return ' '.join(rng.choices(words, k=rng.randint(5, 30)))
+
+    now = timezone.now()
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            'INSERT INTO auth_user (password, is_superuser, username, '
+            'first_name, last_name, email, is_staff, is_active, '
+            'date_joined) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)',
+            [('!', False, f'bench{i}', '', '', '', False, True, now)
+             for i in range(authors + 1)],
+        )
+        cursor.executemany(
+            'INSERT INTO posts_group (title, slug, description, '
+            'post_count) VALUES (%s, %s, %s, %s)',
+            [(f'Группа {i}', f'bench-{i}', '', 0) for i in range(groups)],
+        )
+        cursor.execute('SELECT MIN(id) FROM auth_user')
+        first_user = cursor.fetchone()[0]
+        cursor.execute('SELECT MIN(id) FROM posts_group')
+        first_group = cursor.fetchone()[0]
+        reader = first_user + authors
+        for start in range(0, posts, batch):
+            cursor.executemany(
+                'INSERT INTO posts_post (text, pub_date, updated, author_id, '
+                'group_id, image, comment_count) '
+                'VALUES (%s, %s, %s, %s, %s, %s, %s)',
+                [(text(f'Пост {i}'), now - timedelta(seconds=posts - i),
+                  now - timedelta(seconds=posts - i),
+                  first_user + rng.randrange(authors),
+                  first_group + rng.randrange(groups)
+                  if rng.random() < 0.7 else None,
+                  '', 0)
+                 for i in range(start, min(start + batch, posts))],
+            )
+        cursor.execute('SELECT MAX(id) FROM posts_post')
+        last_post = cursor.fetchone()[0]
+        cursor.executemany(
+            'INSERT INTO posts_comment (text, pub_date, author_id, post_id, '
+            'path, depth, reply_count) VALUES (%s, %s, %s, %s, %s, 0, 0)',
+            [(text('Комментарий'), now - timedelta(seconds=i),
+              first_user + rng.randrange(authors), last_post, '')
+             for i in range(comments)],
+        )
+        cursor.execute(
+            "UPDATE posts_comment SET path = printf('%010d/', id) "
+            "WHERE path = ''"
+        )
+        cursor.executemany(
+            'INSERT INTO posts_follow (user_id, author_id) VALUES (%s, %s)',
+            [(reader, first_user + i) for i in range(min(follows, authors))],
+        )
+    from posts.counters import rebuild_counters
+    from posts.models import Group, Post
+    from posts.timeline import rebuild_timelines
+    rebuild_counters()
+    rebuild_timelines()
+    connection.cursor().execute('ANALYZE')
+    return (
+        User.objects.get(pk=reader),
+        Group.objects.get(pk=first_group),
+        User.objects.get(pk=first_user),
+        Post.objects.get(pk=last_post),
+    )
@@ -0,0 +1,81 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.text import compress_string
+
+from posts.api import POST_FIELDS, brotli, post_json
+from posts.models import Post
+
+from ._bench import best_of, scratch_database, seed
+
+
+def instance_json(post):
+    """Сериализация через объекты моделей, как при рендеринге шаблонов."""
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'pub_date': post.pub_date,
+        'updated': post.updated,
+        'author': post.author.username,
+        'group': post.group.slug if post.group else None,
+        'image': post.image.url if post.image else None,
+    }
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает скорость сериализации страницы ленты в JSON '
+            'через объекты моделей и через .values() и размер ответа '
+            'без сжатия, с gzip и brotli.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=10_000)
+        parser.add_argument('--per-page', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        per_page = options['per_page']
+        with scratch_database():
+            self.stdout.write(f'Заполнение: {options["posts"]} постов...')
+            seed(options['posts'], words=[
+                'котик', 'прогулка', 'парк', 'солнце', 'рецепт', 'книга',
+                'дорога', 'утро', 'музыка', 'город', 'море', 'лес',
+            ])
+            feed = Post.objects.feed()[:per_page]
+            rows = Post.objects.feed().values(*POST_FIELDS)[:per_page]
+            variants = {
+                'Объекты моделей': lambda: [
+                    instance_json(post) for post in feed.all()
+                ],
+                '.values()': lambda: [post_json(row) for row in rows.all()],
+            }
+            for title, serialize in variants.items():
+                elapsed = best_of(
+                    lambda: json.dumps(
+                        serialize(), cls=DjangoJSONEncoder,
+                        ensure_ascii=False, separators=(',', ':'),
+                    ),
+                    options['repeat'],
+                )
+                self.stdout.write(
+                    f'{title}: {elapsed:.2f} мс на страницу '
+                    f'({1000 / elapsed:.0f} страниц/с)'
+                )
+            body = json.dumps(
+                [post_json(row) for row in rows],
+                cls=DjangoJSONEncoder, ensure_ascii=False,
+                separators=(',', ':'),
+            ).encode()
+            sizes = [f'без сжатия {len(body)} Б',
+                     f'gzip {len(compress_string(body))} Б']
+            if brotli is not None:
+                sizes.append(f'brotli {len(brotli.compress(body))} Б')
+            else:
+                sizes.append('brotli: пакет не установлен')
+            self.stdout.write(
+                f'Страница из {per_page} постов: ' + ', '.join(sizes)
+            )
+            self.stdout.write(
+                f'Страница API по умолчанию: {settings.NUMBER_POSTS} постов.'
+            )
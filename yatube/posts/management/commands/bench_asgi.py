@@ -0,0 +1,184 @@
+import asyncio
+import io
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from core.asgi import ReadPoolWsgiToAsgi, WsgiToAsgi
+
+from ._bench import scratch_database, seed
+
+
+def percentile(timings, share):
+    return timings[min(int(len(timings) * share), len(timings) - 1)]
+
+
+class Command(BaseCommand):
+    help = ('Нагружает ленты и страницу поста одновременными клиентами '
+            'через WSGI-обработчик в потоках и через ASGI-приложение '
+            'с отдельным пулом чтений, сравнивает запросы в секунду и '
+            'хвост задержки. Каждый пятый запрос — лёгкая страница '
+            'не из лент, её задержка выводится отдельно. Кэш отключён.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=10_000)
+        parser.add_argument('--clients', type=int, default=32)
+        parser.add_argument('--requests', type=int, default=20,
+                            help='Запросов на клиента.')
+        parser.add_argument('--threads', type=int, default=12,
+                            help='Потоков у WSGI-сервера.')
+        parser.add_argument('--read-threads', type=int, default=8,
+                            help='Потоков для чтений у ASGI.')
+
+    def environ(self, path):
+        return {
+            'REQUEST_METHOD': 'GET',
+            'PATH_INFO': path,
+            'QUERY_STRING': '',
+            'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': 'localhost',
+            'wsgi.input': io.BytesIO(),
+            'wsgi.url_scheme': 'http',
+        }
+
+    def schedule(self, paths, other, client, count):
+        """Пути запросов клиента: каждый пятый — other."""
+        return [
+            other if (client + number) % 5 == 0
+            else paths[(client + number) % len(paths)]
+            for number in range(count)
+        ]
+
+    def run_wsgi(self, handler, paths, other, options):
+        """Клиенты — потоки, сервер — options['threads'] воркеров:
+        клиент ждёт свободного воркера, как в очереди потокового
+        WSGI-сервера."""
+        workers = threading.BoundedSemaphore(options['threads'])
+        timings = {'feed': [], 'other': []}
+
+        def client(number):
+            for path in self.schedule(paths, other, number,
+                                      options['requests']):
+                start = time.perf_counter()
+                with workers:
+                    response = handler(self.environ(path),
+                                       lambda status, headers: None)
+                    try:
+                        b''.join(response)
+                    finally:
+                        response.close()
+                kind = 'other' if path == other else 'feed'
+                timings[kind].append((time.perf_counter() - start) * 1000)
+
+        threads = [
+            threading.Thread(target=client, args=(number,))
+            for number in range(options['clients'])
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - start, timings
+
+    def run_asgi(self, application, paths, other, options):
+        """Клиенты — задачи в цикле событий, который и есть сервер."""
+        timings = {'feed': [], 'other': []}
+
+        async def request(path):
+            async def receive():
+                return {'type': 'http.request', 'body': b''}
+
+            async def send(message):
+                pass
+
+            await application({
+                'type': 'http', 'method': 'GET', 'path': path,
+                'query_string': b'',
+                'headers': [(b'host', b'localhost')],
+            }, receive, send)
+
+        async def client(number):
+            for path in self.schedule(paths, other, number,
+                                      options['requests']):
+                start = time.perf_counter()
+                await request(path)
+                kind = 'other' if path == other else 'feed'
+                timings[kind].append((time.perf_counter() - start) * 1000)
+
+        async def main():
+            await asyncio.gather(*(
+                client(number) for number in range(options['clients'])
+            ))
+
+        start = time.perf_counter()
+        asyncio.run(main())
+        return time.perf_counter() - start, timings
+
+    def report(self, title, elapsed, timings):
+        total = len(timings['feed']) + len(timings['other'])
+        feed = sorted(timings['feed'])
+        other = sorted(timings['other'])
+        self.stdout.write(
+            f'{title}: запросов/с: {total / elapsed:.0f}, ленты p50/p95/p99: '
+            f'{percentile(feed, 0.5):.1f}/{percentile(feed, 0.95):.1f}/'
+            f'{percentile(feed, 0.99):.1f} мс, прочее p50/p95: '
+            f'{percentile(other, 0.5):.1f}/{percentile(other, 0.95):.1f} мс'
+        )
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp()
+        name = os.path.join(directory, 'bench.sqlite3')
+        dummy = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+        dummy_cache = {'default': dummy, 'pages': dummy}
+        threads = options['threads']
+        read_threads = min(options['read_threads'], threads - 1)
+        try:
+            with scratch_database(name=name), \
+                    override_settings(CACHES=dummy_cache):
+                self.stdout.write(f'Заполнение: {options["posts"]} постов...')
+                _, group, author, post = seed(options['posts'], comments=50)
+                paths = [
+                    reverse('posts:index'),
+                    reverse('posts:group_list', args=[group.slug]),
+                    reverse('posts:profile', args=[author.username]),
+                    reverse('posts:post_detail', args=[post.pk]),
+                ]
+                other = reverse('posts:post_create')
+                connection.close()
+                handler = WSGIHandler()
+                self.report(
+                    f'WSGI, {threads} потоков',
+                    *self.run_wsgi(handler, paths, other, options),
+                )
+                with ThreadPoolExecutor(threads) as executor:
+                    self.report(
+                        f'ASGI, общий пул {threads} потоков',
+                        *self.run_asgi(WsgiToAsgi(handler, executor),
+                                       paths, other, options),
+                    )
+                with ThreadPoolExecutor(read_threads) as read_executor, \
+                        ThreadPoolExecutor(threads - read_threads) as executor:
+                    self.report(
+                        f'ASGI, чтения {read_threads} + '
+                        f'прочее {threads - read_threads} потоков',
+                        *self.run_asgi(
+                            ReadPoolWsgiToAsgi(handler, read_executor,
+                                               executor),
+                            paths, other, options,
+                        ),
+                    )
+        finally:
+            for filename in os.listdir(directory):
+                os.remove(os.path.join(directory, filename))
+            os.rmdir(directory)
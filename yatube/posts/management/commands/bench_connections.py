@@ -0,0 +1,151 @@
+import io
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from core.backends.sqlite3.base import clear_pools
+
+from ._bench import scratch_database, seed
+
+# Режимы соединений: (название, CONN_MAX_AGE, POOL_SIZE).
+MODES = (
+    ('Новое соединение на запрос', 0, 0),
+    ('CONN_MAX_AGE=60', 60, 0),
+    ('Пул POOL_SIZE=8', 0, 8),
+)
+
+
+class Command(BaseCommand):
+    help = ('Нагружает ленты через WSGI-обработчик из нескольких потоков '
+            'и сравнивает задержку и число открытых соединений без '
+            'сохранения соединений, с CONN_MAX_AGE и с пулом. Кэш '
+            'отключён, чтобы каждый запрос доходил до базы.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=10_000)
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--requests', type=int, default=200)
+
+    def environ(self, path):
+        return {
+            'REQUEST_METHOD': 'GET',
+            'PATH_INFO': path,
+            'QUERY_STRING': '',
+            'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': 'localhost',
+            'wsgi.input': io.BytesIO(),
+            'wsgi.url_scheme': 'http',
+        }
+
+    def request(self, handler, path, timings):
+        start = time.perf_counter()
+        response = handler(self.environ(path), lambda status, headers: None)
+        try:
+            b''.join(response)
+        finally:
+            # close() шлёт request_finished: там Django закрывает
+            # соединения без CONN_MAX_AGE.
+            response.close()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    def worker(self, handler, paths, count, timings):
+        try:
+            for number in range(count):
+                self.request(handler, paths[number % len(paths)], timings)
+        finally:
+            connection.close()
+
+    def run(self, handler, paths, options, per_request):
+        """per_request: каждый запрос в своём потоке, как в runserver."""
+        timings = []
+        total = options['threads'] * options['requests']
+        if per_request:
+            batches = [
+                [(1,)] * options['threads']
+                for _ in range(options['requests'])
+            ]
+        else:
+            batches = [[(options['requests'],)] * options['threads']]
+        start = time.perf_counter()
+        for batch in batches:
+            threads = [
+                threading.Thread(
+                    target=self.worker,
+                    args=(handler, paths, count, timings),
+                )
+                for count, in batch
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        elapsed = time.perf_counter() - start
+        timings.sort()
+        return (
+            f'запросов/с: {total / elapsed:.0f}, '
+            f'медиана: {statistics.median(timings):.2f} мс, '
+            f'p95: {timings[int(len(timings) * 0.95)]:.2f} мс'
+        )
+
+    def handle(self, *args, **options):
+        database = settings.DATABASES['default']
+        saved = {key: database.get(key) for key in ('CONN_MAX_AGE',
+                                                    'POOL_SIZE')}
+        opened = set()
+
+        def count_connection(sender, connection, **kwargs):
+            # Соединение из пула тоже шлёт connection_created, поэтому
+            # считаются разные объекты sqlite3.Connection.
+            opened.add(connection.connection)
+
+        directory = tempfile.mkdtemp()
+        name = os.path.join(directory, 'bench.sqlite3')
+        dummy = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+        dummy_cache = {'default': dummy, 'pages': dummy}
+        try:
+            with scratch_database(name=name), \
+                    override_settings(CACHES=dummy_cache):
+                self.stdout.write(f'Заполнение: {options["posts"]} постов...')
+                _, group, author, _ = seed(options['posts'])
+                paths = [
+                    reverse('posts:index'),
+                    reverse('posts:group_list', args=[group.slug]),
+                    reverse('posts:profile', args=[author.username]),
+                ]
+                connection.close()
+                handler = WSGIHandler()
+                connection_created.connect(count_connection)
+                for per_request, title in (
+                    (False, 'Потоки на весь прогон'),
+                    (True, 'Поток на запрос'),
+                ):
+                    self.stdout.write(self.style.MIGRATE_HEADING(title))
+                    for mode, max_age, pool_size in MODES:
+                        database['CONN_MAX_AGE'] = max_age
+                        database['POOL_SIZE'] = pool_size
+                        opened.clear()
+                        result = self.run(handler, paths, options,
+                                          per_request)
+                        clear_pools()
+                        self.stdout.write(
+                            f'{mode}: {result}, '
+                            f'открыто соединений: {len(opened)}'
+                        )
+        finally:
+            connection_created.disconnect(count_connection)
+            database.update(saved)
+            for filename in os.listdir(directory):
+                os.remove(os.path.join(directory, filename))
+            os.rmdir(directory)
@@ -0,0 +1,69 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.models import Comment, Post, TimelineEntry
+from posts.utils import CursorPaginator
+
+from ._bench import best_of, scratch_database, seed
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает планы и время запросов лент без составных '
+            'индексов и с ними на сгенерированных данных.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1_000_000)
+        parser.add_argument('--comments', type=int, default=100_000)
+        parser.add_argument('--follows', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def feed_queries(self, reader, group, author, post):
+        per_page = settings.NUMBER_POSTS
+        deep = per_page * 5000
+        ordering = CursorPaginator.ordering
+        index = Post.objects.feed().order_by(*ordering)
+        return {
+            'index': index,
+            'index OFFSET 5000 стр.': index[deep:deep + per_page],
+            'group': group.posts.feed().order_by(*ordering),
+            'profile': author.posts.profile().order_by(*ordering),
+            'follow, PostQuerySet.timeline': Post.objects.feed().timeline(
+                reader).order_by(*ordering),
+            'follow, ключи TimelineEntry': TimelineEntry.objects.filter(
+                user=reader).order_by('-pub_date', '-post_id').values_list(
+                'pub_date', 'post_id'),
+            'comments': post.comments.select_related('author'),
+        }
+
+    def report(self, title, queries, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        for name, queryset in queries.items():
+            if queryset.query.can_filter():
+                queryset = queryset[:settings.NUMBER_POSTS]
+            elapsed = best_of(lambda: list(queryset.all()), repeat)
+            self.stdout.write(f'{name}: {elapsed:.2f} мс')
+            for line in queryset.explain().splitlines():
+                self.stdout.write(f'    {line}')
+
+    def handle(self, *args, **options):
+        indexes = [
+            (model, index)
+            for model in (Post, Comment, TimelineEntry)
+            for index in model._meta.indexes
+        ]
+        with scratch_database() as connection:
+            self.stdout.write(f'Заполнение: {options["posts"]} постов...')
+            queries = self.feed_queries(*seed(
+                options['posts'], comments=options['comments'],
+                follows=options['follows'],
+            ))
+            with connection.schema_editor() as editor:
+                for model, index in indexes:
+                    editor.remove_index(model, index)
+            connection.cursor().execute('ANALYZE')
+            self.report('Без составных индексов', queries, options['repeat'])
+            with connection.schema_editor() as editor:
+                for model, index in indexes:
+                    editor.add_index(model, index)
+            connection.cursor().execute('ANALYZE')
+            self.report('С составными индексами', queries, options['repeat'])
@@ -0,0 +1,64 @@
+import random
+
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.search import LikeSearchBackend, SQLiteFTSBackend
+from posts.utils import CountedPaginator
+
+from ._bench import best_of, scratch_database, seed
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает поиск по индексу SQLite FTS5 с LIKE без индекса '
+            'на сгенерированных постах: первая страница и число найденных.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100_000)
+        parser.add_argument('--comments', type=int, default=10_000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def vocabulary(self, size=20_000):
+        rng = random.Random(1)
+        letters = 'абвгдежзиклмнопрстуфхцчшэюя'
+        return [
+            ''.join(rng.choices(letters, k=rng.randint(4, 10)))
+            for _ in range(size)
+        ]
+
+    def first_page(self, backend, query):
+        paginator = CountedPaginator(
+            backend.search(Post.objects.feed(), query), 10
+        )
+        page = paginator.get_page(1)
+        return paginator.count, list(page)
+
+    def handle(self, *args, **options):
+        words = self.vocabulary()
+        queries = {
+            'частое слово': words[0],
+            'префикс': words[1][:3],
+            'два слова': f'{words[2]} {words[3]}',
+            'нет совпадений': 'ъъъъ',
+        }
+        with scratch_database():
+            self.stdout.write(f'Заполнение: {options["posts"]} постов...')
+            seed(
+                options['posts'], comments=options['comments'],
+                words=words[:2000],
+            )
+            fts = SQLiteFTSBackend()
+            fts.rebuild()
+            for title, backend in (('LIKE без индекса', LikeSearchBackend()),
+                                   ('SQLite FTS5', fts)):
+                self.stdout.write(self.style.MIGRATE_HEADING(title))
+                for name, query in queries.items():
+                    found = self.first_page(backend, query)[0]
+                    elapsed = best_of(
+                        lambda: self.first_page(backend, query),
+                        options['repeat'],
+                    )
+                    self.stdout.write(
+                        f'{name} ({query}): найдено {found}, '
+                        f'{elapsed:.2f} мс'
+                    )
@@ -0,0 +1,101 @@
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, transaction
+
+from posts.models import Comment, Post
+
+from ._bench import scratch_database, seed
+
+# Настройки SQLite по умолчанию для сравнения с settings.SQLITE_PRAGMAS.
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'DELETE',
+    'synchronous': 'FULL',
+    'busy_timeout': 5000,
+}
+
+
+class Command(BaseCommand):
+    help = ('Измеряет, сколько раз в секунду читается первая страница '
+            'ленты, пока другие потоки пишут комментарии: с настройками '
+            'SQLite по умолчанию и с settings.SQLITE_PRAGMAS.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=10_000)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--seconds', type=float, default=5)
+
+    def reader(self, stop, stats):
+        try:
+            while not stop.is_set():
+                try:
+                    list(Post.objects.feed()[:settings.NUMBER_POSTS])
+                    stats['reads'] += 1
+                except OperationalError:
+                    stats['errors'] += 1
+        finally:
+            connection.close()
+
+    def writer(self, stop, stats, post, author):
+        try:
+            while not stop.is_set():
+                try:
+                    with transaction.atomic():
+                        Comment.objects.create(
+                            post=post, author=author, text='Нагрузка'
+                        )
+                    stats['writes'] += 1
+                except OperationalError:
+                    stats['errors'] += 1
+        finally:
+            connection.close()
+
+    def run(self, pragmas, options, post, author):
+        settings.DATABASES['default']['PRAGMAS'] = pragmas
+        connection.close()
+        stop = threading.Event()
+        stats = {'reads': 0, 'writes': 0, 'errors': 0}
+        threads = [
+            threading.Thread(target=self.reader, args=(stop, stats))
+            for _ in range(options['readers'])
+        ] + [
+            threading.Thread(
+                target=self.writer, args=(stop, stats, post, author)
+            )
+            for _ in range(options['writers'])
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(options['seconds'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+        seconds = options['seconds']
+        return (
+            f'чтений/с: {stats["reads"] / seconds:.0f}, '
+            f'записей/с: {stats["writes"] / seconds:.0f}, '
+            f'ошибок блокировки: {stats["errors"]}'
+        )
+
+    def handle(self, *args, **options):
+        pragmas = settings.DATABASES['default'].get('PRAGMAS', {})
+        directory = tempfile.mkdtemp()
+        name = os.path.join(directory, 'bench.sqlite3')
+        try:
+            with scratch_database(name=name):
+                self.stdout.write(f'Заполнение: {options["posts"]} постов...')
+                _, _, author, post = seed(options['posts'])
+                for title, mode in (('По умолчанию', DEFAULT_PRAGMAS),
+                                    ('SQLITE_PRAGMAS', pragmas)):
+                    result = self.run(mode, options, post, author)
+                    self.stdout.write(f'{title}: {result}')
+        finally:
+            settings.DATABASES['default']['PRAGMAS'] = pragmas
+            for filename in os.listdir(directory):
+                os.remove(os.path.join(directory, filename))
+            os.rmdir(directory)
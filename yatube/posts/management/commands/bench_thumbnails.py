@@ -0,0 +1,126 @@
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, Concat
+from django.test.utils import CaptureQueriesContext
+from sorl.thumbnail import default
+from sorl.thumbnail.parsers import parse_geometry
+
+from posts.models import Post
+from posts.thumbnails import (DeferredThumbnailBackend, ThumbnailBatch,
+                              thumbnail_specs)
+from posts.utils import CursorPaginator
+
+from ._bench import best_of, scratch_database, seed
+
+
+@contextmanager
+def count_cache_calls(kv_cache):
+    """Считает обращения к кэшу key-value store sorl-thumbnail.
+
+    get внутри get_many (как в LocMemCache) отдельно не считается.
+    """
+    calls = {'count': 0, 'depth': 0}
+    originals = {}
+    for name in ('get', 'get_many'):
+        originals[name] = method = getattr(kv_cache, name)
+
+        def counted(*args, method=method, **kwargs):
+            calls['count'] += not calls['depth']
+            calls['depth'] += 1
+            try:
+                return method(*args, **kwargs)
+            finally:
+                calls['depth'] -= 1
+        setattr(kv_cache, name, counted)
+    try:
+        yield calls
+    finally:
+        for name in originals:
+            delattr(kv_cache, name)
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает число обращений к key-value store sorl-thumbnail '
+            'на страницу ленты: по одному на миниатюру и её производные '
+            'и одним ThumbnailBatch.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def card_specs(self):
+        return [
+            value for spec, value in thumbnail_specs().items()
+            if spec[0] == 'card'
+        ]
+
+    def one_by_one(self, page):
+        """Миниатюра card и её производные для srcset, каждая отдельно."""
+        backend = DeferredThumbnailBackend()
+        return [
+            backend.get_thumbnail(post.image, geometry_string, **options)
+            for post in page
+            for geometry_string, options in self.card_specs()
+        ]
+
+    def batched(self, page):
+        """То же, что выводит тег post_image: миниатюра и <source>."""
+        batch = ThumbnailBatch(page, ['card'])
+        return [
+            (batch.get(post, 'card'), batch.sources(post, 'card'))
+            for post in page
+        ]
+
+    def mark_ready(self, page):
+        """Записывает в key-value store готовые миниатюры постов размера
+        card вместе с производными: иначе ThumbnailBatch на тёплом
+        проходе спрашивал бы базу о неудавшихся картинках."""
+        backend = DeferredThumbnailBackend()
+        for post in page:
+            for geometry_string, options in self.card_specs():
+                thumbnail = backend.thumbnail_file(
+                    post.image, geometry_string, **options
+                )
+                thumbnail.set_size(parse_geometry(geometry_string))
+                default.kvstore.set(thumbnail)
+
+    def measure(self, connection, render, page):
+        kv_cache = default.kvstore.cache
+        kv_cache.clear()
+        with count_cache_calls(kv_cache) as cold_cache, \
+                CaptureQueriesContext(connection) as cold_queries:
+            render(page)
+        with count_cache_calls(kv_cache) as warm_cache, \
+                CaptureQueriesContext(connection) as warm_queries:
+            render(page)
+        elapsed = best_of(lambda: render(page), self.repeat)
+        return (
+            f'холодный кэш: {cold_cache["count"]} обращений к кэшу, '
+            f'{len(cold_queries)} SQL; '
+            f'тёплый: {warm_cache["count"]} обращений к кэшу, '
+            f'{len(warm_queries)} SQL; {elapsed:.2f} мс'
+        )
+
+    def handle(self, *args, **options):
+        self.repeat = options['repeat']
+        with scratch_database() as connection:
+            seed(options['posts'], authors=100, follows=0)
+            Post.objects.update(image=Concat(
+                Value('posts/bench'), Cast('pk', CharField()), Value('.jpg')
+            ))
+            paginator = CursorPaginator(
+                Post.objects.feed(), settings.NUMBER_POSTS
+            )
+            page = list(paginator.get_page(None))
+            self.mark_ready(page)
+            self.stdout.write(
+                f'Страница ленты: {len(page)} постов с готовыми миниатюрами'
+            )
+            for name, render in (('По одному', self.one_by_one),
+                                 ('ThumbnailBatch', self.batched)):
+                self.stdout.write(
+                    f'{name}: {self.measure(connection, render, page)}'
+                )
@@ -0,0 +1,67 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.page_cache import invalidate_post_pages
+from posts.thumbnails import collect_image, schedule
+
+
+def walk(storage, path):
+    """Имена всех файлов хранилища в каталоге path и глубже."""
+    directories, files = storage.listdir(path)
+    for name in files:
+        yield os.path.join(path, name)
+    for directory in directories:
+        yield from walk(storage, os.path.join(path, directory))
+
+
+class Command(BaseCommand):
+    help = ('Переносит картинки постов под имена из хэша содержимого, '
+            'сливая одинаковые, и удаляет файлы, на которые не ссылается '
+            'ни один пост.')
+
+    def readdress(self, storage):
+        """Пересохраняет картинки со старыми именами, возвращает число."""
+        moved = 0
+        names = Post.objects.exclude(image='').exclude(
+            image__isnull=True
+        ).values_list('image', flat=True).distinct()
+        for name in list(names):
+            if storage.is_content_name(name) or not storage.exists(name):
+                continue
+            with storage.open(name) as content:
+                new_name = storage.save(name, content)
+            if new_name == name:
+                continue
+            Post.objects.filter(image=name).update(image=new_name)
+            for post in Post.objects.filter(
+                image=new_name
+            ).select_related('author'):
+                invalidate_post_pages(post, post.group_id)
+            schedule(new_name)
+            collect_image(name)
+            moved += 1
+        return moved
+
+    def handle(self, *args, **options):
+        field = Post._meta.get_field('image')
+        storage = field.storage
+        moved = self.readdress(storage)
+        referenced = set(
+            Post.objects.values_list('image', flat=True).distinct()
+        )
+        removed = freed = 0
+        upload_dir = field.upload_to.rstrip('/')
+        if storage.exists(upload_dir):
+            for name in walk(storage, upload_dir):
+                if name in referenced:
+                    continue
+                size = storage.size(name)
+                if collect_image(name):
+                    removed += 1
+                    freed += size
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено картинок: {moved}, удалено лишних файлов: '
+            f'{removed} ({freed / 1024 / 1024:.1f} МБ).'
+        ))
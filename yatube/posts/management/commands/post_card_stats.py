@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from core.stats import require_shared_cache
+from posts.cards import card_stats, reset_card_stats
+
+
+class Command(BaseCommand):
+    help = 'Показывает долю попаданий в кэш карточек постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true', help='Обнулить счётчики.'
+        )
+
+    def handle(self, *args, **options):
+        require_shared_cache()
+        stats = card_stats()
+        self.stdout.write(
+            f'Попаданий: {stats["hits"]}, промахов: {stats["misses"]}, '
+            f'доля попаданий: {stats["ratio"]:.1%}'
+        )
+        if options['reset']:
+            reset_card_stats()
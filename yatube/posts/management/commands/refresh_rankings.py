@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from posts.ranking import refresh_rankings
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает затухающие рейтинги постов и групп и обновляет '
+            'списки «Популярного» в кэше. Запускается по расписанию, '
+            'например раз в пять минут.')
+
+    def handle(self, *args, **options):
+        rows = refresh_rankings()
+        self.stdout.write(self.style.SUCCESS(
+            f'Рейтинги обновлены, строк: {rows}.'
+        ))
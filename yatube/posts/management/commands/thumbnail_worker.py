@@ -0,0 +1,34 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.thumbnails import process_jobs, retry_failed
+
+
+class Command(BaseCommand):
+    help = ('Фоновый воркер: режет миниатюры картинок постов '
+            'из очереди пулом потоков.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int)
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Разобрать очередь один раз и выйти.'
+        )
+        parser.add_argument(
+            '--retry-failed', action='store_true',
+            help='Вернуть в очередь картинки, исчерпавшие попытки.'
+        )
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            self.stdout.write(f'Возвращено в очередь: {retry_failed()}')
+        while True:
+            done = process_jobs(options['workers'])
+            if done:
+                self.stdout.write(f'Готово картинок: {done}')
+            if options['once'] and not done:
+                return
+            if not done:
+                time.sleep(settings.THUMBNAIL_POLL_INTERVAL)
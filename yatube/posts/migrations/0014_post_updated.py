@@ -0,0 +1,25 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:21
+
+from django.db import migrations, models
+
+
+def fill_updated(apps, schema_editor):
+    """Для существующих постов дата изменения — дата публикации."""
+    post_model = apps.get_model('posts', 'Post')
+    post_model.objects.update(updated=models.F('pub_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_comment_threads'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+        migrations.RunPython(fill_updated, migrations.RunPython.noop),
+    ]
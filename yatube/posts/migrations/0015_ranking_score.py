@@ -0,0 +1,31 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_post_updated'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankingScore',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('post', 'Пост'), ('group', 'Группа')], max_length=5, verbose_name='Объект')),
+                ('object_id', models.PositiveIntegerField(verbose_name='ID объекта')),
+                ('score', models.FloatField(default=0, verbose_name='Рейтинг')),
+                ('updated', models.FloatField(verbose_name='Время рейтинга')),
+            ],
+            options={
+                'verbose_name': 'Рейтинг',
+                'verbose_name_plural': 'Рейтинги',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='rankingscore',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_ranking_score'),
+        ),
+    ]
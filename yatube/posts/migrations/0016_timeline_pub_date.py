@@ -0,0 +1,39 @@
+# Generated by Django 2.2.16 on 2026-10-18 07:10
+
+from django.db import migrations, models
+
+
+def fill_pub_date(apps, schema_editor):
+    """Копирует дату публикации поста в уже разосланные записи ленты."""
+    entry_model = apps.get_model('posts', 'TimelineEntry')
+    post_model = apps.get_model('posts', 'Post')
+    entry_model.objects.update(pub_date=models.Subquery(
+        post_model.objects.filter(
+            pk=models.OuterRef('post')
+        ).values('pub_date')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_ranking_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timelineentry',
+            name='pub_date',
+            field=models.DateTimeField(null=True, verbose_name='Дата публикации'),
+        ),
+        migrations.RunPython(fill_pub_date, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='timelineentry',
+            name='pub_date',
+            field=models.DateTimeField(verbose_name='Дата публикации'),
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', '-pub_date', '-post'], name='timeline_user_feed_idx'),
+        ),
+    ]
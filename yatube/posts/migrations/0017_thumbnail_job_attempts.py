@@ -0,0 +1,23 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_timeline_pub_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='thumbnailjob',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='thumbnailjob',
+            name='failed',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+def reinstall_search(apps, schema_editor):
+    from posts.search import get_backend
+    backend = get_backend()
+    backend.uninstall(schema_editor.connection)
+    backend.install(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_thumbnail_job_attempts'),
+    ]
+
+    operations = [
+        # Комментарии переезжают в свои строки индекса; откат оставляет
+        # новый индекс, старую схему текущий бэкенд не читает.
+        migrations.RunPython(reinstall_search, migrations.RunPython.noop),
+    ]
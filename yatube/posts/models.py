@@ -1,8 +1,13 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
 
 from core.models import CreatedModel
 
+from .storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
@@ -11,6 +16,11 @@ class Group(models.Model):
     title = models.CharField(max_length=200, verbose_name='Заголовок')
     slug = models.SlugField(unique=True, verbose_name='Ссылка')
     description = models.TextField(verbose_name='Описание')
+    post_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число постов'
+    )
 
     class Meta:
         verbose_name = 'Группы'
@@ -20,6 +30,38 @@ class Group(models.Model):
         return self.title
 
 
+def popular_follows(user):
+    """Авторы из подписок user, чьи посты не рассылаются по лентам."""
+    return Follow.objects.filter(
+        user=user,
+        author__stats__followers__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).values('author')
+
+
+class PostQuerySet(models.QuerySet):
+    """Профили загрузки связанных объектов для страниц с постами."""
+
+    def feed(self):
+        """Ленты: карточка поста выводит автора и группу."""
+        return self.select_related('author', 'group')
+
+    def profile(self):
+        """Профиль: автор уже известен, нужна только группа."""
+        return self.select_related('group')
+
+    def detail(self):
+        """Страница поста: автор со счётчиками и группа."""
+        return self.select_related('author__stats', 'group')
+
+    def timeline(self, user):
+        """Лента подписок: посты, разосланные пользователю при публикации,
+        и посты популярных авторов, которые читаются при запросе."""
+        fanned_out = TimelineEntry.objects.filter(user=user).values('post')
+        return self.filter(
+            Q(pk__in=fanned_out) | Q(author__in=popular_follows(user))
+        )
+
+
 class Post(CreatedModel):
     """Модель для хранения постов."""
     author = models.ForeignKey(
@@ -40,21 +82,99 @@ class Post(CreatedModel):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True,
         null=True
     )
+    comment_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число комментариев'
+    )
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Сообщение пользователя'
         verbose_name_plural = 'Сообщения пользователей'
+        # Индексы повторяют WHERE/ORDER BY лент из posts.views,
+        # id добавлен для keyset-пагинации по (pub_date, id).
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_feed_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_feed_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_feed_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    @property
+    def edited(self):
+        """Пост правили после публикации. При создании auto_now
+        и auto_now_add расходятся на доли секунды."""
+        return (self.updated - self.pub_date).total_seconds() >= 1
+
+
+# Сегмент материализованного пути: id комментария фиксированной ширины,
+# чтобы порядок строк совпадал с порядком обхода дерева.
+PATH_SEGMENT = '{:010d}/'
+PATH_SEGMENT_LENGTH = 11
+
+
+def path_ids(path):
+    """id комментариев из пути, от корня треда до самого комментария."""
+    return [int(segment) for segment in path.split('/') if segment]
+
+
+class CommentQuerySet(models.QuerySet):
+    def roots(self):
+        """Комментарии к посту, начинающие треды."""
+        return self.filter(parent__isnull=True)
+
+    def first_replies(self, parents, limit):
+        """Не больше limit первых прямых ответов на каждый из parents.
+
+        Номер ответа среди соседей считает ROW_NUMBER() по parent_id,
+        поэтому широкий тред не читается целиком: строк не больше
+        limit на родителя. Соседи по пути идут в порядке id.
+        """
+        ranked = self.filter(parent__in=parents).annotate(
+            sibling_rank=Window(
+                RowNumber(),
+                partition_by=[F('parent_id')],
+                order_by=F('path').asc(),
+            )
+        ).order_by().values('pk', 'sibling_rank')
+        sql, params = ranked.query.sql_with_params()
+        return self.extra(
+            where=[
+                f'{self.model._meta.db_table}.id IN (SELECT id FROM '
+                f'({sql}) WHERE sibling_rank <= %s)'
+            ],
+            params=[*params, limit],
+        ).order_by('path')
+
 
 class Comment(CreatedModel):
-    """Модель для хранения комментариев."""
+    """Модель для хранения комментариев.
+
+    Ответы образуют дерево: path хранит id всех предков и самого
+    комментария, reply_count — число ответов на всех уровнях ниже.
+    """
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
@@ -67,15 +187,69 @@ class Comment(CreatedModel):
         related_name='comments',
         verbose_name='Автор'
     )
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        related_name='replies',
+        blank=True,
+        null=True,
+        verbose_name='Ответ на'
+    )
+    path = models.CharField(
+        max_length=255,
+        default='',
+        editable=False,
+        verbose_name='Путь в дереве'
+    )
+    depth = models.PositiveSmallIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Глубина'
+    )
+    reply_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число ответов'
+    )
+
+    objects = CommentQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Комментарий пользователя'
         verbose_name_plural = 'Комментарии пользователей'
+        indexes = [
+            models.Index(
+                fields=['post', '-pub_date'],
+                name='comment_post_idx'
+            ),
+            models.Index(
+                fields=['post', 'path'],
+                name='comment_path_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text
 
+    def save(self, *args, **kwargs):
+        if self.parent_id and self.parent.depth >= settings.COMMENT_MAX_DEPTH:
+            # Ответ на самом глубоком уровне становится соседом,
+            # а не опускает тред ещё ниже.
+            self.parent = self.parent.parent
+        super().save(*args, **kwargs)
+        if not self.path:
+            parent_path = self.parent.path if self.parent_id else ''
+            self.path = parent_path + PATH_SEGMENT.format(self.pk)
+            self.depth = len(self.path) // PATH_SEGMENT_LENGTH - 1
+            Comment.objects.filter(pk=self.pk).update(
+                path=self.path, depth=self.depth
+            )
+
+    @property
+    def ancestor_ids(self):
+        return path_ids(self.path)[:-1]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -100,3 +274,128 @@ class Follow(models.Model):
 
     def __str__(self):
         return f'{self.user} подписался на {self.author}'
+
+
+class AuthorStats(models.Model):
+    """Денормализованные счётчики пользователя, обновляются сигналами."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь'
+    )
+    posts = models.PositiveIntegerField(default=0, verbose_name='Постов')
+    followers = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписчиков'
+    )
+    following = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписок'
+    )
+
+    class Meta:
+        verbose_name = 'Статистика автора'
+        verbose_name_plural = 'Статистика авторов'
+
+    def __str__(self):
+        return f'Статистика {self.user}'
+
+
+class TimelineEntry(models.Model):
+    """Пост автора, разосланный в ленту подписок подписчика."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Пост'
+    )
+    # Копия Post.pub_date: лента листается по индексу этой таблицы,
+    # а посты читаются только для готовой страницы.
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи ленты подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry'
+            )]
+        indexes = [
+            models.Index(
+                fields=['user', 'author'],
+                name='timeline_user_author_idx'
+            ),
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_feed_idx'
+            )]
+
+    def __str__(self):
+        return f'{self.post_id} в ленте {self.user}'
+
+
+class RankingScore(models.Model):
+    """Затухающий рейтинг поста или группы для страницы «Популярное».
+
+    score действителен на момент updated (секунды Unix) и с тех пор
+    вдвое уменьшается каждые RANKING_HALF_LIFE секунд. Строки есть
+    только у объектов с недавними событиями.
+    """
+    POST = 'post'
+    GROUP = 'group'
+    KINDS = (
+        (POST, 'Пост'),
+        (GROUP, 'Группа'),
+    )
+    kind = models.CharField(max_length=5, choices=KINDS,
+                            verbose_name='Объект')
+    object_id = models.PositiveIntegerField(verbose_name='ID объекта')
+    score = models.FloatField(default=0, verbose_name='Рейтинг')
+    updated = models.FloatField(verbose_name='Время рейтинга')
+
+    class Meta:
+        verbose_name = 'Рейтинг'
+        verbose_name_plural = 'Рейтинги'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'object_id'],
+                name='unique_ranking_score'
+            )]
+
+    def __str__(self):
+        return f'{self.kind} {self.object_id}: {self.score:.2f}'
+
+
+class ThumbnailJob(models.Model):
+    """Картинка поста, для которой фоновый воркер готовит миниатюры.
+
+    Неудачная попытка остаётся в очереди, после
+    settings.THUMBNAIL_MAX_ATTEMPTS попыток задача помечается failed
+    и больше не разбирается и не ставится заново.
+    """
+    image = models.CharField(max_length=255, unique=True)
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    failed = models.BooleanField(default=False)
+
+    class Meta:
+        verbose_name = 'Задача на миниатюры'
+        verbose_name_plural = 'Задачи на миниатюры'
+
+    def __str__(self):
+        return self.image
@@ -0,0 +1,153 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.middleware.csrf import get_token
+from django.views.decorators.http import condition
+
+from core.db import read_from_replica
+
+from .models import Group
+from .thumbnails import has_placeholder
+
+PAGE_KEY = 'page:{}:{}:{}'
+TAG_KEY = 'page_tag:{}'
+
+
+def tag_versions(tags):
+    """Текущие версии тегов, недостающие заводятся заново."""
+    keys = [TAG_KEY.format(tag) for tag in tags]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            now = time.time_ns()
+            versions[key] = (
+                now if cache.add(key, now, None) else cache.get(key)
+            )
+    return [str(versions[key]) for key in keys]
+
+
+def invalidate_pages(*tags):
+    """Сбрасывает все закэшированные страницы, зависящие от тегов.
+
+    Страницы не удаляются по одной: меняется версия тега, которая входит
+    в ключ страницы, а старые записи вытесняются по таймауту.
+    """
+    now = time.time_ns()
+    cache.set_many(
+        {TAG_KEY.format(tag): now for tag in tags if tag}, None
+    )
+
+
+def invalidate_post_pages(post, *group_ids):
+    """Сбрасывает ленты, профиль, страницу и карточку поста."""
+    slugs = Group.objects.filter(
+        pk__in=[pk for pk in group_ids if pk]
+    ).values_list('slug', flat=True)
+    invalidate_pages(
+        'posts',
+        f'post:{post.pk}',
+        f'card:{post.pk}',
+        f'author:{post.author.username}',
+        *(f'group:{slug}' for slug in slugs),
+    )
+
+
+def request_tag_versions(request, tags, kwargs):
+    """Версии тегов страницы, читаются один раз за запрос."""
+    if not hasattr(request, 'page_tag_versions'):
+        request.page_tag_versions = tag_versions(tags(**kwargs))
+    return request.page_tag_versions
+
+
+def page_key(view_name, request, versions):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    version = hashlib.md5(':'.join(versions).encode()).hexdigest()
+    return PAGE_KEY.format(view_name, path, version)
+
+
+def cache_anonymous_page(tags):
+    """Кэширует страницу для анонимных посетителей.
+
+    tags(**kwargs) получает аргументы view из URL и возвращает теги
+    данных, от которых зависит страница; invalidate_pages с любым
+    из этих тегов сбрасывает страницу.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (request.method not in ('GET', 'HEAD')
+                    or request.user.is_authenticated):
+                return view(request, *args, **kwargs)
+            key = page_key(
+                view.__name__, request,
+                request_tag_versions(request, tags, kwargs),
+            )
+            # Ответы целиком — в своём кэше: они крупные и не должны
+            # вытеснять версии тегов из default.
+            page_cache = caches['pages']
+            response = page_cache.get(key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                # Реплика может ещё не видеть запись, которая уже
+                # сменила версии тегов: её страница не кэшируется.
+                if (response.status_code == 200 and not response.cookies
+                        and not read_from_replica(request)
+                        and not has_placeholder(response.content)):
+                    page_cache.set(
+                        key, response, settings.PAGE_CACHE_TIMEOUT
+                    )
+            return response
+        return wrapper
+    return decorator
+
+
+def conditional_page(tags):
+    """ETag и Last-Modified страницы из версий её тегов.
+
+    Версия тега — время последней записи, которая его сбросила, поэтому
+    валидаторы считаются по кэшу без рендеринга и запросов к постам,
+    а неизменившаяся страница отдаётся ответом 304. В ETag входят
+    пользователь и его CSRF-токен: авторизованным показываются свои
+    кнопки и формы, а после входа токен меняется, и сохранённая
+    браузером форма с прежним токеном получила бы 403.
+
+    Страница, прочитанная из отстающей реплики, уходит без валидаторов:
+    иначе её устаревшая версия отдавалась бы ответом 304 до следующей
+    записи.
+    """
+    def etag(request, *args, **kwargs):
+        user = csrf = ''
+        if request.user.is_authenticated:
+            user = request.user.pk
+            get_token(request)
+            csrf = request.META['CSRF_COOKIE']
+        versions = request_tag_versions(request, tags, kwargs)
+        return hashlib.md5(':'.join([
+            request.get_full_path(), str(user), csrf, *versions
+        ]).encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        versions = request_tag_versions(request, tags, kwargs)
+        newest = max(int(version) for version in versions)
+        return datetime.fromtimestamp(newest / 10**9, timezone.utc)
+
+    conditional = condition(
+        etag_func=etag, last_modified_func=last_modified
+    )
+
+    def decorator(view):
+        view = conditional(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            if read_from_replica(request):
+                del response['ETag']
+                del response['Last-Modified']
+            return response
+        return wrapper
+    return decorator
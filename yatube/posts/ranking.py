@@ -0,0 +1,120 @@
+"""Рейтинги «Популярное»: посты и группы с затухающими очками.
+
+События (комментарий, подписка на автора) сразу прибавляют вес
+к строке RankingScore одним UPDATE, прежние очки при этом
+уменьшаются по времени. Команда refresh_rankings периодически
+приводит все очки к текущему моменту, удаляет затухшие строки
+и кладёт отсортированные списки id в кэш, откуда их читает
+страница популярного.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Power
+
+from .models import Group, Post, RankingScore
+
+RANKING_KEY = 'ranking:{}'
+
+MODELS = {
+    RankingScore.POST: Post,
+    RankingScore.GROUP: Group,
+}
+
+
+def decayed(now):
+    """Выражение очков строки на момент now."""
+    return F('score') * Power(
+        Value(0.5), (Value(now) - F('updated')) / settings.RANKING_HALF_LIFE
+    )
+
+
+def bump(kind, object_id, weight, now=None):
+    """Прибавляет weight к очкам объекта, создавая строку при нужде."""
+    now = time.time() if now is None else now
+    rows = RankingScore.objects.filter(kind=kind, object_id=object_id)
+    if rows.update(score=decayed(now) + weight, updated=now):
+        return
+    try:
+        with transaction.atomic():
+            RankingScore.objects.create(
+                kind=kind, object_id=object_id, score=weight, updated=now
+            )
+    except IntegrityError:
+        # Строку успел создать параллельный запрос.
+        rows.update(score=decayed(now) + weight, updated=now)
+
+
+def bump_post(post_id, group_id, event):
+    """Событие поста засчитывается и посту, и его группе."""
+    weight = settings.RANKING_WEIGHTS[event]
+    bump(RankingScore.POST, post_id, weight)
+    if group_id:
+        bump(RankingScore.GROUP, group_id, weight)
+
+
+def record_comment(comment):
+    group_id = Post.objects.filter(pk=comment.post_id).values_list(
+        'group_id', flat=True
+    ).first()
+    bump_post(comment.post_id, group_id, 'comment')
+
+
+def record_follow(follow):
+    """Новый подписчик засчитывается последнему посту автора."""
+    latest = Post.objects.filter(author_id=follow.author_id).order_by(
+        '-pub_date', '-pk'
+    ).values_list('pk', 'group_id').first()
+    if latest is not None:
+        bump_post(*latest, 'follow')
+
+
+def top_ids(kind, now=None):
+    """RANKING_SIZE id объектов с наибольшими очками на момент now."""
+    now = time.time() if now is None else now
+    return list(
+        RankingScore.objects.filter(kind=kind)
+        .annotate(current=decayed(now))
+        .order_by('-current', '-object_id')
+        .values_list('object_id', flat=True)[:settings.RANKING_SIZE]
+    )
+
+
+def ranked_ids(kind):
+    """Отсортированный список id из кэша, при промахе — из таблицы."""
+    key = RANKING_KEY.format(kind)
+    ids = cache.get(key)
+    if ids is None:
+        ids = top_ids(kind)
+        cache.set(key, ids, settings.RANKING_TIMEOUT)
+    return ids
+
+
+def in_order(queryset, ids):
+    """Объекты queryset в порядке ids, удалённые пропускаются."""
+    objects = queryset.in_bulk(ids)
+    return [objects[pk] for pk in ids if pk in objects]
+
+
+def refresh_rankings(now=None):
+    """Приводит очки к моменту now, удаляет затухшие строки и строки
+    удалённых объектов, обновляет списки в кэше. Возвращает число
+    оставшихся строк."""
+    now = time.time() if now is None else now
+    with transaction.atomic():
+        RankingScore.objects.update(score=decayed(now), updated=now)
+        RankingScore.objects.filter(
+            score__lt=settings.RANKING_MIN_SCORE
+        ).delete()
+        for kind, model in MODELS.items():
+            RankingScore.objects.filter(kind=kind).exclude(
+                object_id__in=model.objects.values('pk')
+            ).delete()
+    cache.set_many(
+        {RANKING_KEY.format(kind): top_ids(kind, now) for kind in MODELS},
+        settings.RANKING_TIMEOUT,
+    )
+    return RankingScore.objects.count()
@@ -0,0 +1,189 @@
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection as default_connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+WORD_RE = re.compile(r'\w+')
+
+
+def query_words(query):
+    """Слова поискового запроса без знаков препинания и операторов."""
+    return WORD_RE.findall(query or '')[:settings.POST_SEARCH_MAX_WORDS]
+
+
+class SearchBackend:
+    """Поиск по тексту постов и комментариев к ним.
+
+    search() сужает queryset постов до найденных и сортирует их
+    по релевантности, index_*() и remove_*() держат индекс
+    в актуальном состоянии, их вызывают сигналы.
+    """
+
+    def install(self, connection):
+        """Создаёт индекс; вызывается из миграции."""
+
+    def uninstall(self, connection):
+        """Удаляет индекс; вызывается при откате миграции."""
+
+    def rebuild(self):
+        """Заполняет индекс заново по всем постам и комментариям."""
+
+    def index_post(self, post_id):
+        """Переиндексирует текст поста."""
+
+    def remove_post(self, post_id):
+        """Убирает пост из индекса."""
+
+    def index_comment(self, comment_id):
+        """Переиндексирует один комментарий."""
+
+    def remove_comment(self, comment_id):
+        """Убирает комментарий из индекса."""
+
+    def search(self, queryset, query):
+        raise NotImplementedError
+
+
+class LikeSearchBackend(SearchBackend):
+    """Поиск через LIKE '%слово%' без индекса: подходит для любой базы,
+    но просматривает все строки. Служит базой для сравнения."""
+
+    def search(self, queryset, query):
+        words = query_words(query)
+        if not words:
+            return queryset.none()
+        for word in words:
+            queryset = queryset.filter(
+                Q(text__icontains=word) | Q(comments__text__icontains=word)
+            )
+        return queryset.distinct()
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """Инвертированный индекс SQLite FTS5.
+
+    Текст поста лежит в одной виртуальной таблице под rowid, равным id
+    поста, каждый комментарий — отдельной строкой другой под своим id,
+    так что новый или удалённый комментарий меняет одну строку индекса.
+    Посты с совпадением в тексте или в любом комментарии собираются
+    при поиске и сортируются по лучшему bm25, совпадение в тексте поста
+    весит больше совпадения в комментарии. Все слова запроса должны
+    найтись в одной строке: в тексте поста или в одном комментарии.
+    """
+
+    table = 'posts_post_search'
+    comment_table = 'posts_comment_search'
+    weights = (10.0, 1.0)
+
+    def install(self, connection):
+        if connection.vendor != 'sqlite':
+            return
+        with connection.cursor() as cursor:
+            for table in (self.table, self.comment_table):
+                cursor.execute(
+                    f'CREATE VIRTUAL TABLE IF NOT EXISTS {table} '
+                    f'USING fts5(text, '
+                    f"tokenize='unicode61 remove_diacritics 2')"
+                )
+        self.rebuild(connection)
+
+    def uninstall(self, connection):
+        if connection.vendor != 'sqlite':
+            return
+        with connection.cursor() as cursor:
+            for table in (self.table, self.comment_table):
+                cursor.execute(f'DROP TABLE IF EXISTS {table}')
+
+    def _index_sql(self, table, source, where=''):
+        return (
+            f'INSERT OR REPLACE INTO {table} (rowid, text) '
+            f'SELECT id, text FROM {source} {where}'
+        )
+
+    def rebuild(self, connection=default_connection):
+        with connection.cursor() as cursor:
+            for table, source in ((self.table, 'posts_post'),
+                                  (self.comment_table, 'posts_comment')):
+                cursor.execute(f'DELETE FROM {table}')
+                cursor.execute(self._index_sql(table, source))
+
+    def _execute(self, sql, params):
+        with default_connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+    def index_post(self, post_id):
+        self._execute(
+            self._index_sql(self.table, 'posts_post', 'WHERE id = %s'),
+            [post_id],
+        )
+
+    def remove_post(self, post_id):
+        self._execute(
+            f'DELETE FROM {self.table} WHERE rowid = %s', [post_id]
+        )
+
+    def index_comment(self, comment_id):
+        self._execute(
+            self._index_sql(
+                self.comment_table, 'posts_comment', 'WHERE id = %s'
+            ),
+            [comment_id],
+        )
+
+    def remove_comment(self, comment_id):
+        self._execute(
+            f'DELETE FROM {self.comment_table} WHERE rowid = %s',
+            [comment_id],
+        )
+
+    def match_expression(self, query):
+        """Запрос FTS5: все слова, каждое как префикс, в кавычках,
+        чтобы ввод пользователя не разбирался как операторы."""
+        return ' '.join(f'"{word}"*' for word in query_words(query))
+
+    def search(self, queryset, query):
+        expression = self.match_expression(query)
+        if not expression:
+            return queryset.none()
+        posts, comments = self.table, self.comment_table
+        post_weight, comment_weight = self.weights
+        # Совпадения ищутся по каждой таблице один раз и группируются
+        # по посту. bm25 нельзя вызвать прямо внутри агрегата, поэтому
+        # ранги считаются в UNION ALL, а MIN берётся снаружи; SQLite
+        # материализует группировку один раз на запрос.
+        ranked = (
+            f'SELECT post_id, MIN(rank) AS rank FROM ('
+            f'SELECT rowid AS post_id, bm25({posts}) * {post_weight} '
+            f'AS rank FROM {posts} WHERE {posts} MATCH %s '
+            f'UNION ALL SELECT posts_comment.post_id, '
+            f'bm25({comments}) * {comment_weight} FROM {comments} '
+            f'JOIN posts_comment ON posts_comment.id = {comments}.rowid '
+            f'WHERE {comments} MATCH %s) GROUP BY post_id'
+        )
+        return queryset.extra(
+            where=[f'posts_post.id IN (SELECT post_id FROM ({ranked}))'],
+            params=[expression, expression],
+            select={'search_rank': (
+                f'(SELECT rank FROM ({ranked}) AS ranked '
+                f'WHERE ranked.post_id = posts_post.id)'
+            )},
+            select_params=[expression, expression],
+            order_by=['search_rank', '-pub_date'],
+        )
+
+
+@lru_cache(maxsize=None)
+def load_backend(path):
+    return import_string(path)()
+
+
+def get_backend():
+    """Бэкенд из settings.POST_SEARCH_BACKEND."""
+    return load_backend(settings.POST_SEARCH_BACKEND)
+
+
+def search_posts(queryset, query):
+    return get_backend().search(queryset, query)
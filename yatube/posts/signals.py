@@ -0,0 +1,241 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .broadcast import publish_post
+from .counters import (change_feed_counts, feed_key, post_feed_keys,
+                       reset_feed_counts)
+from .models import AuthorStats, Comment, Follow, Group, Post, path_ids
+from .page_cache import invalidate_pages, invalidate_post_pages
+from .ranking import record_comment, record_follow
+from .search import get_backend as search_backend
+from .thumbnails import collect_image, schedule
+from .timeline import backfill, fan_out, is_popular, prune
+
+User = get_user_model()
+
+
+def follower_feed_keys(author_id):
+    """Счётчики лент подписок всех подписчиков автора.
+
+    У популярного автора подписчиков слишком много для cache.incr
+    на каждого, поэтому их счётчики не сдвигаются, а доживают
+    до FEED_COUNT_TIMEOUT, как и лента без рассылки (timeline).
+    """
+    if is_popular(author_id):
+        return []
+    followers = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+    return [feed_key('follow', user_id) for user_id in followers]
+
+
+def shift(queryset, **deltas):
+    """Атомарно сдвигает счётчики через UPDATE ... SET f = f + delta.
+
+    Уменьшение не опускает счётчик ниже нуля, расхождения
+    исправляет команда rebuild_counters.
+    """
+    for field, delta in deltas.items():
+        rows = queryset
+        if delta < 0:
+            rows = rows.filter(**{f'{field}__gte': -delta})
+        rows.update(**{field: F(field) + delta})
+
+
+@receiver(post_save, sender=User)
+def create_author_stats(sender, instance, created, **kwargs):
+    if created:
+        AuthorStats.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_post(sender, instance, **kwargs):
+    """Запоминает прежние группу и картинку, чтобы отследить их смену."""
+    if instance.pk is None:
+        return
+    instance._previous_group_id, instance._previous_image = (
+        Post.objects.filter(pk=instance.pk).values_list(
+            'group_id', 'image'
+        ).first() or (None, None)
+    )
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, **kwargs):
+    if created:
+        change_feed_counts(
+            post_feed_keys(instance) + follower_feed_keys(instance.author_id),
+            1,
+        )
+        shift(AuthorStats.objects.filter(user_id=instance.author_id), posts=1)
+        if instance.group_id:
+            shift(Group.objects.filter(pk=instance.group_id), post_count=1)
+        fan_out(instance)
+        return
+    previous_group_id = getattr(instance, '_previous_group_id', None)
+    if previous_group_id != instance.group_id:
+        if previous_group_id:
+            change_feed_counts([feed_key('group', previous_group_id)], -1)
+            shift(Group.objects.filter(pk=previous_group_id), post_count=-1)
+        if instance.group_id:
+            change_feed_counts([feed_key('group', instance.group_id)], 1)
+            shift(Group.objects.filter(pk=instance.group_id), post_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    change_feed_counts(
+        post_feed_keys(instance) + follower_feed_keys(instance.author_id),
+        -1,
+    )
+    shift(AuthorStats.objects.filter(user_id=instance.author_id), posts=-1)
+    if instance.group_id:
+        shift(Group.objects.filter(pk=instance.group_id), post_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, **kwargs):
+    if created:
+        shift(Post.objects.filter(pk=instance.post_id), comment_count=1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    shift(Post.objects.filter(pk=instance.post_id), comment_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_reply(sender, instance, created, **kwargs):
+    if created and instance.parent_id:
+        shift(
+            Comment.objects.filter(pk__in=path_ids(instance.parent.path)),
+            reply_count=1,
+        )
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_reply(sender, instance, **kwargs):
+    # При удалении ветки каждый удалённый ответ уменьшает счётчики
+    # только уцелевших предков: строки удалённых уже не обновятся.
+    shift(
+        Comment.objects.filter(pk__in=instance.ancestor_ids),
+        reply_count=-1,
+    )
+
+
+@receiver(post_save, sender=Follow)
+def count_saved_follow(sender, instance, created, **kwargs):
+    reset_feed_counts([feed_key('follow', instance.user_id)])
+    if created:
+        stats = AuthorStats.objects
+        shift(stats.filter(user_id=instance.author_id), followers=1)
+        shift(stats.filter(user_id=instance.user_id), following=1)
+        backfill(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    reset_feed_counts([feed_key('follow', instance.user_id)])
+    stats = AuthorStats.objects
+    shift(stats.filter(user_id=instance.author_id), followers=-1)
+    shift(stats.filter(user_id=instance.user_id), following=-1)
+    prune(instance)
+
+
+@receiver(post_save, sender=Comment)
+def rank_commented_post(sender, instance, created, **kwargs):
+    if created:
+        record_comment(instance)
+
+
+@receiver(post_save, sender=Follow)
+def rank_followed_author(sender, instance, created, **kwargs):
+    if created:
+        record_follow(instance)
+
+
+@receiver(post_save, sender=Post)
+def invalidate_saved_post_pages(sender, instance, **kwargs):
+    invalidate_post_pages(
+        instance,
+        instance.group_id,
+        getattr(instance, '_previous_group_id', None),
+    )
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_deleted_post_pages(sender, instance, **kwargs):
+    invalidate_post_pages(instance, instance.group_id)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_pages(sender, instance, **kwargs):
+    invalidate_pages(f'post:{instance.post_id}')
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_pages(sender, instance, **kwargs):
+    invalidate_pages(
+        f'author:{instance.author.username}',
+        f'author:{instance.user.username}',
+    )
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_pages(sender, instance, **kwargs):
+    invalidate_pages('groups')
+
+
+@receiver(post_save, sender=Post)
+def schedule_thumbnails(sender, instance, created, **kwargs):
+    """Готовит миниатюры в фоне сразу после сохранения картинки."""
+    previous = None if created else getattr(instance, '_previous_image', None)
+    if instance.image and instance.image.name != previous:
+        schedule(instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+def collect_replaced_image(sender, instance, created, **kwargs):
+    """Удаляет прежнюю картинку поста, если она больше никому не нужна."""
+    previous = None if created else getattr(instance, '_previous_image', None)
+    if previous and previous != instance.image.name:
+        transaction.on_commit(lambda: collect_image(previous))
+
+
+@receiver(post_delete, sender=Post)
+def collect_deleted_image(sender, instance, **kwargs):
+    if instance.image:
+        name = instance.image.name
+        transaction.on_commit(lambda: collect_image(name))
+
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, **kwargs):
+    search_backend().index_post(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_deleted_post(sender, instance, **kwargs):
+    search_backend().remove_post(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def index_saved_comment(sender, instance, **kwargs):
+    search_backend().index_comment(instance.pk)
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_deleted_comment(sender, instance, **kwargs):
+    search_backend().remove_comment(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def broadcast_new_post(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: publish_post(instance))
@@ -0,0 +1,60 @@
+import hashlib
+import os
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+HASH_RE = re.compile('[0-9a-f]{64}')
+
+
+def content_hash(content):
+    """SHA-256 содержимого файла, читаемого кусками."""
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранит файлы под именем из хэша содержимого.
+
+    Файл posts/photo.jpg сохраняется как posts/ab/abcdef….jpg, поэтому
+    одинаковые загрузки пишутся на диск один раз и делят миниатюры.
+    Ссылками на файл служат строки Post с этим именем: файл удаляется
+    сигналами, когда последняя из них пропадает.
+    """
+
+    @staticmethod
+    def is_content_name(name):
+        """Имя уже построено из хэша: <каталог>/ab/abcdef….ext."""
+        directory, filename = os.path.split(name)
+        stem = os.path.splitext(filename)[0]
+        return (HASH_RE.fullmatch(stem) is not None
+                and os.path.basename(directory) == stem[:2])
+
+    def content_name(self, name, content):
+        if self.is_content_name(name):
+            name = os.path.join(
+                os.path.dirname(os.path.dirname(name)),
+                os.path.basename(name),
+            )
+        directory, filename = os.path.split(name)
+        digest = content_hash(content)
+        extension = os.path.splitext(filename)[1].lower()
+        return os.path.join(directory, digest[:2], digest + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
@@ -0,0 +1,41 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from ..cards import CardBatch
+from ..thumbnails import ThumbnailBatch
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def prefetch_post_cards(context, posts, variant='feed'):
+    """Достаёт из кэша карточки всей страницы одним запросом."""
+    context['post_cards'] = CardBatch(posts, variant)
+    return ''
+
+
+@register.simple_tag(takes_context=True)
+def post_card(context, post, variant='feed'):
+    batch = context.get('post_cards')
+    if batch is None or batch.variant != variant:
+        batch = CardBatch([post], variant)
+    return mark_safe(batch.render(post))
+
+
+@register.inclusion_tag('posts/includes/post_image.html', takes_context=True)
+def post_image(context, post, size):
+    """<picture> с миниатюрой размера из settings.POST_THUMBNAILS
+    и её производными для srcset.
+
+    Миниатюры берутся из ThumbnailBatch в контексте, без него
+    читаются отдельно.
+    """
+    batch = context.get('post_thumbnails')
+    if post.image and (batch is None or not batch.has(post, size)):
+        batch = ThumbnailBatch([post], [size])
+    if batch is None:
+        return {'image': None}
+    return {
+        'image': batch.get(post, size),
+        'sources': batch.sources(post, size),
+    }
@@ -0,0 +1,185 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..counters import feed_key, get_feed_count
+from ..models import AuthorStats, Comment, Follow, Group, Post, User
+
+
+class FeedCountTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='counters',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.feeds = {
+            feed_key('index'): Post.objects.all(),
+            feed_key('group', self.group.pk): self.group.posts.all(),
+            feed_key('author', self.author.pk): self.author.posts.all(),
+            feed_key('follow', self.reader.pk): Post.objects.filter(
+                author__following__user=self.reader
+            ),
+        }
+        for key, queryset in self.feeds.items():
+            get_feed_count(key, queryset)
+
+    def assertCounts(self, expected):
+        for key, queryset in self.feeds.items():
+            with self.subTest(key=key):
+                with self.assertNumQueries(0):
+                    self.assertEqual(get_feed_count(key, queryset), expected)
+
+    def test_counts_follow_post_create_and_delete(self):
+        """Счётчики лент меняются без повторного COUNT(*)."""
+        post = Post.objects.create(
+            text='Тестовый пост', author=self.author, group=self.group
+        )
+        self.assertCounts(1)
+        post.delete()
+        self.assertCounts(0)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_popular_author_skips_follower_counts(self):
+        """Пост популярного автора не трогает счётчики подписчиков."""
+        with mock.patch.object(cache, 'incr', wraps=cache.incr) as incr:
+            Post.objects.create(text='Тестовый пост', author=self.author)
+        self.assertNotIn(
+            feed_key('follow', self.reader.pk),
+            [call.args[0] for call in incr.call_args_list],
+        )
+        self.assertEqual(cache.get(feed_key('index')), 1)
+
+    def test_group_change_moves_count(self):
+        """Смена группы поста переносит его в счётчик новой группы."""
+        post = Post.objects.create(
+            text='Тестовый пост', author=self.author, group=self.group
+        )
+        post.group = None
+        post.save()
+        self.assertEqual(cache.get(feed_key('group', self.group.pk)), 0)
+
+    def test_follow_resets_follow_feed_count(self):
+        """Подписка сбрасывает счётчик ленты подписок читателя."""
+        Follow.objects.filter(user=self.reader).delete()
+        self.assertIsNone(cache.get(feed_key('follow', self.reader.pk)))
+
+
+class DenormalizedCountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='stats',
+            description='Тестовое описание',
+        )
+
+    def assertStats(self, user, **expected):
+        stats = AuthorStats.objects.get(user=user)
+        for field, value in expected.items():
+            with self.subTest(user=user, field=field):
+                self.assertEqual(getattr(stats, field), value)
+
+    def test_counters_follow_writes(self):
+        """Счётчики меняются вместе с постами, комментариями и подписками."""
+        post = Post.objects.create(
+            text='Тестовый пост', author=self.author, group=self.group
+        )
+        comment = Comment.objects.create(
+            text='Комментарий', author=self.reader, post=post
+        )
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        post.refresh_from_db()
+        self.group.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(self.group.post_count, 1)
+        self.assertStats(self.author, posts=1, followers=1, following=0)
+        self.assertStats(self.reader, posts=0, followers=0, following=1)
+        comment.delete()
+        follow.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 0)
+        self.assertStats(self.author, followers=0)
+        self.assertStats(self.reader, following=0)
+        post.delete()
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.post_count, 0)
+        self.assertStats(self.author, posts=0)
+
+    def test_reply_counts(self):
+        """Число ответов в ветке меняется у всех предков, rebuild_counters
+        даёт те же значения."""
+        post = Post.objects.create(text='Тестовый пост', author=self.author)
+        root = Comment.objects.create(
+            text='Корень', author=self.reader, post=post
+        )
+        reply = Comment.objects.create(
+            text='Ответ', author=self.author, post=post, parent=root
+        )
+        for _ in range(2):
+            Comment.objects.create(
+                text='Ответ на ответ', author=self.reader, post=post,
+                parent=reply,
+            )
+
+        def counts():
+            return dict(Comment.objects.values_list('text', 'reply_count'))
+
+        self.assertEqual(
+            counts(), {'Корень': 3, 'Ответ': 2, 'Ответ на ответ': 0}
+        )
+        Comment.objects.update(reply_count=0)
+        call_command('rebuild_counters', stdout=StringIO())
+        self.assertEqual(
+            counts(), {'Корень': 3, 'Ответ': 2, 'Ответ на ответ': 0}
+        )
+        reply.delete()
+        self.assertEqual(counts(), {'Корень': 0})
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+
+    def test_rebuild_counters_command(self):
+        """rebuild_counters исправляет разошедшиеся счётчики."""
+        Post.objects.bulk_create([
+            Post(text='Тестовый пост', author=self.author, group=self.group)
+            for _ in range(3)
+        ])
+        AuthorStats.objects.filter(user=self.reader).delete()
+        call_command('rebuild_counters', stdout=StringIO())
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.post_count, 3)
+        self.assertStats(self.author, posts=3)
+        self.assertStats(self.reader, posts=0)
+
+    def test_profile_shows_counts_without_aggregates(self):
+        """Профиль и пост показывают число постов из счётчика."""
+        post = Post.objects.create(text='Тестовый пост', author=self.author)
+        pages = (
+            reverse('posts:profile', args=(self.author.username,)),
+            reverse('posts:post_detail', args=(post.pk,)),
+        )
+        for page in pages:
+            with self.subTest(page=page):
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.get(page)
+                self.assertFalse([
+                    query for query in queries.captured_queries
+                    if 'COUNT(' in query['sql']
+                ])
@@ -0,0 +1,219 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache, caches
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.test.utils import override_settings
+
+from core.backends.sqlite3.base import DatabaseWrapper, clear_pools
+from core.checks import check_shared_cache
+from core.db import (
+    PIN_SESSION_KEY, ROUTE_STATS_KEY, ReadOnlyViewRouter, check_connections,
+    pin_primary, read_only_view, reset_routing_stats, routing_stats,
+)
+from core.stats import incr_counter
+
+from ..models import Post
+from ..page_cache import cache_anonymous_page, conditional_page
+
+
+class SQLitePragmasTest(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied(self):
+        """Соединение получает PRAGMA из настроек базы."""
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        self.assertEqual(self.pragma('temp_store'), 2)
+
+
+class ConnectionPoolTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(os.rmdir, directory)
+        name = os.path.join(directory, 'pool.sqlite3')
+        self.addCleanup(lambda: [
+            os.remove(path) for path in (name, f'{name}-wal', f'{name}-shm')
+            if os.path.exists(path)
+        ])
+        self.addCleanup(clear_pools)
+        self.settings_dict = {
+            **connection.settings_dict, 'NAME': name, 'POOL_SIZE': 1,
+            'CONN_HEALTH_CHECKS': True,
+        }
+
+    def wrapper(self, alias='pool'):
+        return DatabaseWrapper(self.settings_dict, alias)
+
+    def test_closed_connection_reused(self):
+        """Закрытое соединение возвращается в пул и достаётся следующему
+        потоку, а не открывается заново."""
+        first = self.wrapper()
+        first.ensure_connection()
+        raw = first.connection
+        first.close()
+        second = self.wrapper()
+        second.ensure_connection()
+        self.assertIs(second.connection, raw)
+        other = self.wrapper(alias='other')
+        other.ensure_connection()
+        self.assertIsNot(other.connection, raw)
+        second.close()
+        other.close()
+
+    def test_broken_connection_not_reused(self):
+        first = self.wrapper()
+        first.ensure_connection()
+        raw = first.connection
+        first.close()
+        raw.close()
+        second = self.wrapper()
+        second.ensure_connection()
+        self.assertIsNot(second.connection, raw)
+        second.close()
+
+    def test_health_check_before_request(self):
+        """Неотвечающее сохранённое соединение закрывается перед
+        запросом."""
+        wrapper = self.wrapper()
+        wrapper.ensure_connection()
+        with mock.patch('core.db.connections.all', return_value=[wrapper]):
+            check_connections()
+            self.assertIsNotNone(wrapper.connection)
+            with mock.patch.object(wrapper, 'is_usable', return_value=False):
+                check_connections()
+        self.assertIsNone(wrapper.connection)
+
+
+class ReadOnlyViewRouterTest(SimpleTestCase):
+    def setUp(self):
+        reset_routing_stats()
+        self.request = RequestFactory().get('/')
+        self.request.session = {}
+
+    def route(self, request=None):
+        return read_only_view(
+            lambda r: ReadOnlyViewRouter().db_for_read(Post)
+        )(request or self.request)
+
+    def test_reads_routed_inside_view(self):
+        """Внутри read_only_view чтения идут в одну из READ_DATABASES."""
+        with override_settings(READ_DATABASES=['feed']):
+            self.assertEqual(self.route(), 'feed')
+        self.assertIsNone(self.route())
+        self.assertIsNone(ReadOnlyViewRouter().db_for_read(Post))
+        self.assertEqual(ReadOnlyViewRouter().db_for_write(Post), 'default')
+
+    @override_settings(READ_DATABASES=['replica1', 'replica2'])
+    def test_writer_pinned_to_primary(self):
+        """После записи пользователь читает из default, затем снова
+        из реплик."""
+        pin_primary(lambda r: None)(self.request)
+        self.assertIsNone(self.route())
+        self.request.session[PIN_SESSION_KEY] = time.time() - 1
+        self.assertIn(self.route(), ['replica1', 'replica2'])
+        stats = routing_stats()
+        self.assertEqual(stats['pinned'], 1)
+        self.assertEqual(stats['replica1'] + stats['replica2'], 1)
+
+
+class ReplicaPageCacheTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        caches['pages'].clear()
+        self.renders = 0
+
+        @conditional_page(lambda: ['posts'])
+        @cache_anonymous_page(lambda: ['posts'])
+        @read_only_view
+        def page(request):
+            self.renders += 1
+            return HttpResponse('Лента')
+        self.page = page
+
+    def get(self):
+        request = RequestFactory().get('/')
+        request.session = {}
+        request.user = AnonymousUser()
+        return self.page(request)
+
+    def test_replica_page_not_cached(self):
+        """Страница из отстающей реплики не кэшируется и уходит без
+        ETag, из той же базы — как обычно."""
+        replica = {**settings.DATABASES['default'], 'NAME': 'replica'}
+        with mock.patch.dict(settings.DATABASES, {'replica1': replica}), \
+                override_settings(READ_DATABASES=['replica1']):
+            self.assertFalse(self.get().has_header('ETag'))
+            self.get()
+        self.assertEqual(self.renders, 2)
+        self.assertTrue(self.get().has_header('ETag'))
+        self.get()
+        self.assertEqual(self.renders, 3)
+
+
+class SharedCacheCheckTest(SimpleTestCase):
+    def test_local_cache_warns_on_deploy(self):
+        self.assertEqual(
+            [error.id for error in check_shared_cache(None)],
+            ['core.W001', 'core.W001'],
+        )
+        shared = {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': tempfile.gettempdir(),
+        }
+        with override_settings(CACHES={'default': shared, 'pages': shared}):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+class StatsCommandTest(SimpleTestCase):
+    def test_stats_need_shared_cache(self):
+        """Команда статистики не печатает нули из своего LocMemCache,
+        а с общим кэшем видит счётчики других процессов."""
+        with self.assertRaises(CommandError):
+            call_command('db_routing_stats', stdout=StringIO())
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        shared = {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': directory,
+        }
+        with override_settings(CACHES={'default': shared, 'pages': shared},
+                               READ_DATABASES=['feed']):
+            incr_counter(ROUTE_STATS_KEY.format('feed'), 3)
+            output = StringIO()
+            call_command('db_routing_stats', stdout=output)
+        self.assertIn('feed: 3', output.getvalue())
+
+
+class SyncReplicasTest(TestCase):
+    def test_copies_configured_database(self):
+        """Команда работает с бэкендом из настроек и копирует базу."""
+        directory = tempfile.mkdtemp()
+        name = os.path.join(directory, 'replica.sqlite3')
+        self.addCleanup(os.rmdir, directory)
+        self.addCleanup(os.remove, name)
+        replica = {**settings.DATABASES['default'], 'NAME': name}
+        with mock.patch.dict(settings.DATABASES, {'replica1': replica}), \
+                override_settings(READ_DATABASES=['replica1']):
+            call_command('sync_sqlite_replicas', stdout=StringIO())
+        copy = sqlite3.connect(name)
+        try:
+            tables = [row[0] for row in copy.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table'"
+            )]
+        finally:
+            copy.close()
+        self.assertIn(Post._meta.db_table, tables)
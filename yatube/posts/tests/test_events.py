@@ -0,0 +1,232 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TransactionTestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from core.asgi import ReadPoolWsgiToAsgi, WsgiToAsgi
+
+from ..broadcast import LocalBroadcast, get_broadcast
+from ..events import application as events
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+async def start_asgi(application, path, on_message=None):
+    """Начинает GET-запрос к ASGI-приложению и ждёт заголовков ответа.
+
+    Возвращает задачу запроса и словарь ответа со status и body.
+    on_message(body) вызывается на каждую часть тела и возвращает True,
+    когда клиенту пора отключиться.
+    """
+    started = asyncio.Event()
+    disconnect = asyncio.Event()
+    requests = [{'type': 'http.request', 'body': b''}]
+    response = {'body': b''}
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        await disconnect.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+            started.set()
+            return
+        response['body'] += message['body']
+        if on_message and on_message(response['body']):
+            disconnect.set()
+
+    task = asyncio.ensure_future(application({
+        'type': 'http', 'method': 'GET', 'path': path,
+        'query_string': b'', 'headers': [],
+    }, receive, send))
+    waiter = asyncio.ensure_future(started.wait())
+    await asyncio.wait([task, waiter], return_when=asyncio.FIRST_COMPLETED)
+    if not started.is_set():
+        # Приложение упало до ответа: ошибка выходит в тест.
+        waiter.cancel()
+        task.result()
+    return task, response
+
+
+class EventStreamTest(SimpleTestCase):
+    def test_new_posts_streamed(self):
+        """Подписчик общей ленты получает события канала posts."""
+        async def main():
+            def on_message(body):
+                return b'event: post' in body
+
+            task, response = await start_asgi(events, '/events/', on_message)
+            loop = asyncio.get_running_loop()
+            broadcast = get_broadcast()
+            await loop.run_in_executor(
+                None, broadcast.publish, 'group:1', {'id': 1}
+            )
+            await loop.run_in_executor(
+                None, broadcast.publish, 'posts', {'id': 2}
+            )
+            await asyncio.wait_for(task, 5)
+            return response
+
+        response = asyncio.run(main())
+        self.assertEqual(response['status'], 200)
+        self.assertIn(b'id: 2\nevent: post\n', response['body'])
+        self.assertNotIn(b'id: 1\n', response['body'])
+        self.assertFalse(get_broadcast().subscribers)
+
+    def test_follow_requires_session(self):
+        async def main():
+            task, response = await start_asgi(events, '/events/follow/')
+            await task
+            return response
+
+        self.assertEqual(asyncio.run(main())['status'], 401)
+
+
+class ReadPoolTest(SimpleTestCase):
+    def test_read_views_use_read_pool(self):
+        """GET к read_only_view идёт в пул чтений, остальное — в общий."""
+        def wsgi_application(environ, start_response):
+            start_response('200 OK', [])
+            return [threading.current_thread().name.encode()]
+
+        read_pool = ThreadPoolExecutor(1, thread_name_prefix='read')
+        pool = ThreadPoolExecutor(1, thread_name_prefix='write')
+        application = ReadPoolWsgiToAsgi(wsgi_application, read_pool, pool)
+        self.addCleanup(read_pool.shutdown)
+        self.addCleanup(pool.shutdown)
+        cases = (
+            ('GET', reverse('posts:index'), 'read'),
+            ('GET', reverse('posts:post_detail', args=(1,)), 'read'),
+            ('GET', reverse('posts:api_index'), 'read'),
+            ('POST', reverse('posts:index'), 'write'),
+            ('GET', reverse('posts:post_create'), 'write'),
+            ('GET', '/no-such-page/', 'write'),
+        )
+        for method, path, prefix in cases:
+            with self.subTest(method=method, path=path):
+                async def main():
+                    response = {}
+
+                    async def receive():
+                        return {'type': 'http.request', 'body': b''}
+
+                    async def send(message):
+                        response.update(message)
+
+                    await application({
+                        'type': 'http', 'method': method, 'path': path,
+                        'query_string': b'', 'headers': [],
+                    }, receive, send)
+                    return response['body'].decode()
+
+                self.assertTrue(asyncio.run(main()).startswith(prefix))
+
+
+class BroadcastTest(TransactionTestCase):
+    def test_post_published_after_commit(self):
+        """Новый пост рассылается в каналы ленты, автора и группы."""
+        author = User.objects.create(username='author')
+        group = Group.objects.create(title='Группа', slug='live')
+        with mock.patch.object(LocalBroadcast, 'publish') as publish:
+            post = Post.objects.create(
+                text='Новый пост', author=author, group=group
+            )
+        self.assertEqual(
+            [call.args[0] for call in publish.call_args_list],
+            ['posts', f'author:{author.pk}', f'group:{group.pk}'],
+        )
+        self.assertEqual(
+            publish.call_args.args[1]['card'],
+            reverse('posts:post_card', args=(post.pk,)),
+        )
+
+    def test_asgi_serves_pages(self):
+        """yatube.asgi отдаёт страницы Django через пул потоков."""
+        from yatube.asgi import application
+        post = Post.objects.create(
+            text='Пост для карточки',
+            author=User.objects.create(username='author'),
+        )
+
+        async def main():
+            task, response = await start_asgi(
+                application, reverse('posts:post_card', args=(post.pk,))
+            )
+            await task
+            return response
+
+        response = asyncio.run(main())
+        self.assertEqual(response['status'], 200)
+        self.assertIn('Пост для карточки', response['body'].decode())
+
+    def test_asgi_unicode_path(self):
+        """Путь не из latin-1 доходит до Django без повторного unquote."""
+        from yatube.asgi import application
+        User.objects.create(username='иван')
+
+        async def main(path):
+            task, response = await start_asgi(application, path)
+            await task
+            return response
+
+        response = asyncio.run(main('/profile/иван/'))
+        self.assertEqual(response['status'], 200)
+        self.assertIn(
+            reverse('posts:profile_follow', args=('иван',)),
+            response['body'].decode(),
+        )
+        response = asyncio.run(main('/profile/%D0%B8%D0%B2%D0%B0%D0%BD/'))
+        self.assertEqual(response['status'], 404)
+
+
+@override_settings(ASGI_MAX_BODY_SIZE=10)
+class AsgiBodyLimitTest(SimpleTestCase):
+    def post(self, chunks, headers=()):
+        """POST частями chunks к приложению, которое возвращает длину
+        прочитанного тела."""
+        def wsgi_application(environ, start_response):
+            start_response('200 OK', [])
+            return [str(len(environ['wsgi.input'].read())).encode()]
+
+        requests = [
+            {'type': 'http.request', 'body': chunk, 'more_body': True}
+            for chunk in chunks
+        ]
+        requests[-1]['more_body'] = False
+        response = {}
+
+        async def receive():
+            return requests.pop(0)
+
+        async def send(message):
+            response.update(message)
+
+        with ThreadPoolExecutor(1) as executor:
+            asyncio.run(WsgiToAsgi(wsgi_application, executor)({
+                'type': 'http', 'method': 'POST', 'path': '/',
+                'query_string': b'', 'headers': list(headers),
+            }, receive, send))
+        return response
+
+    def test_body_within_limit(self):
+        response = self.post([b'12345', b'67890'])
+        self.assertEqual(response['body'], b'10')
+
+    def test_content_length_over_limit(self):
+        """Заявленное тело больше лимита отклоняется без чтения."""
+        response = self.post([b''], [(b'content-length', b'11')])
+        self.assertEqual(response['status'], 413)
+
+    def test_streamed_body_over_limit(self):
+        """Тело без Content-Length обрывается, когда превысит лимит."""
+        response = self.post([b'12345', b'67890', b'1'])
+        self.assertEqual(response['status'], 413)
@@ -1,10 +1,15 @@
 import tempfile
 from http import HTTPStatus
+from io import BytesIO
 
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
 from django.urls import reverse
+from PIL import Image
 from posts.models import Comment, Group, Post, User
+from posts.storage import ContentAddressedStorage
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp()
 
@@ -73,7 +78,63 @@ class PostCreateFormTests(TestCase):
         post = Post.objects.latest('id')
         self.assertEqual(post.text, form_data['text'])
         self.assertEqual(post.author, self.user)
-        self.assertEqual(form_data['image'], "posts/small.gif")
+        self.assertTrue(
+            ContentAddressedStorage.is_content_name(post.image.name)
+        )
+
+    def upload(self, name, content, content_type='image/gif'):
+        return self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'Пост с картинкой',
+                'image': SimpleUploadedFile(name, content, content_type),
+            },
+        )
+
+    def test_image_limits(self):
+        """Слишком большие файлы и картинки не принимаются."""
+        posts_count = Post.objects.count()
+        content = self.post.image.read()
+        for limits in ({'POST_IMAGE_MAX_SIZE': 10},
+                       {'POST_IMAGE_MAX_PIXELS': 1}):
+            with self.subTest(limits=limits), self.settings(**limits):
+                response = self.upload('big.gif', content)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertTrue(response.context['form'].errors['image'])
+        self.assertEqual(Post.objects.count(), posts_count)
+
+    def test_image_metadata_stripped(self):
+        """EXIF загруженной картинки не сохраняется."""
+        exif = Image.Exif()
+        exif[0x010e] = 'Секретное описание'
+        buffer = BytesIO()
+        Image.new('RGB', (4, 4)).save(buffer, 'JPEG', exif=exif.tobytes())
+        self.upload('photo.jpg', buffer.getvalue(), 'image/jpeg')
+        post = Post.objects.latest('id')
+        with Image.open(post.image) as image:
+            self.assertEqual(image.size, (4, 4))
+            self.assertNotIn('exif', image.info)
+
+    def test_unwritable_format_converted(self):
+        """Картинки, которые Pillow не умеет записывать, хранятся в PNG."""
+        xpm = (
+            b'/* XPM */\n'
+            b'static char *image[] = {\n'
+            b'"2 2 2 1",\n'
+            b'"  c #000000",\n'
+            b'". c #FFFFFF",\n'
+            b'" .",\n'
+            b'". "\n'
+            b'};\n'
+        )
+        response = self.upload('icon.xpm', xpm, 'image/x-xpixmap')
+        self.assertRedirects(
+            response, reverse('posts:profile', args=(self.user.username,))
+        )
+        post = Post.objects.latest('id')
+        self.assertTrue(post.image.name.endswith('.png'))
+        with Image.open(post.image) as image:
+            self.assertEqual((image.format, image.size), ('PNG', (2, 2)))
 
     def test_edit_post(self):
         """Тест редактирования поста авториз. пользователем"""
@@ -122,6 +183,38 @@ class PostCreateFormTests(TestCase):
         self.assertNotEqual(edited_post.group.id, form_data['group'])
 
 
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedImageTest(TransactionTestCase):
+    def setUp(self):
+        # Корзины лимита запросов живут в кэше, а id пользователя
+        # повторяется после сброса базы TransactionTestCase.
+        cache.clear()
+        self.user = User.objects.create_user(username='reposter')
+        self.client.force_login(self.user)
+
+    def create_post(self):
+        image = Image.new('RGB', (3, 3), 'red')
+        buffer = BytesIO()
+        image.save(buffer, 'PNG')
+        self.client.post(reverse('posts:post_create'), data={
+            'text': 'Репост',
+            'image': SimpleUploadedFile(
+                'repost.png', buffer.getvalue(), 'image/png'
+            ),
+        })
+        return Post.objects.latest('id')
+
+    def test_same_upload_stored_once(self):
+        """Одинаковые картинки хранятся одним файлом до последнего поста."""
+        first, second = self.create_post(), self.create_post()
+        self.assertEqual(first.image.name, second.image.name)
+        storage = first.image.storage
+        first.delete()
+        self.assertTrue(storage.exists(second.image.name))
+        second.delete()
+        self.assertFalse(storage.exists(second.image.name))
+
+
 class CommentCreateExistTest(TestCase):
     @classmethod
     def setUpClass(cls):
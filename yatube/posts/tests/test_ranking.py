@@ -0,0 +1,81 @@
+import time
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, RankingScore, User
+from ..ranking import bump, ranked_ids, refresh_rankings
+
+HOUR = 60 * 60
+
+
+@override_settings(RANKING_HALF_LIFE=HOUR, RANKING_MIN_SCORE=0.05)
+class RankingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='author')
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='hot')
+        cls.quiet = Post.objects.create(author=cls.author, text='Тихий')
+        cls.hot = Post.objects.create(
+            author=cls.author, text='Обсуждаемый', group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def scores(self, kind):
+        return dict(RankingScore.objects.filter(kind=kind).values_list(
+            'object_id', 'score'
+        ))
+
+    def test_events_score_posts_and_groups(self):
+        """Комментарий и подписка прибавляют очки посту и его группе."""
+        Comment.objects.create(post=self.hot, author=self.reader, text='А')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertAlmostEqual(
+            self.scores(RankingScore.POST)[self.hot.pk], 4.0, places=3
+        )
+        self.assertAlmostEqual(
+            self.scores(RankingScore.GROUP)[self.group.pk], 4.0, places=3
+        )
+        self.assertNotIn(self.quiet.pk, self.scores(RankingScore.POST))
+
+    def test_scores_decay(self):
+        """Очки вдвое падают за период полураспада, затухшие удаляются."""
+        now = time.time()
+        bump(RankingScore.POST, self.quiet.pk, 8.0, now - HOUR)
+        bump(RankingScore.POST, self.quiet.pk, 1.0, now)
+        bump(RankingScore.POST, self.hot.pk, 1.0, now - 10 * HOUR)
+        refresh_rankings(now)
+        self.assertEqual(
+            self.scores(RankingScore.POST), {self.quiet.pk: 5.0}
+        )
+
+    def test_refresh_orders_and_caches(self):
+        """Команда кладёт в кэш id по убыванию очков без удалённых."""
+        now = time.time()
+        bump(RankingScore.POST, self.quiet.pk, 4.0, now - HOUR)
+        bump(RankingScore.POST, self.hot.pk, 3.0, now)
+        doomed = Post.objects.create(author=self.author, text='Удалённый')
+        bump(RankingScore.POST, doomed.pk, 10.0, now)
+        doomed.delete()
+        call_command('refresh_rankings', stdout=StringIO())
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                ranked_ids(RankingScore.POST), [self.hot.pk, self.quiet.pk]
+            )
+
+    def test_popular_page(self):
+        bump(RankingScore.POST, self.quiet.pk, 1.0)
+        bump(RankingScore.POST, self.hot.pk, 2.0)
+        bump(RankingScore.GROUP, self.group.pk, 2.0)
+        refresh_rankings()
+        response = Client().get(reverse('posts:popular'))
+        self.assertEqual(
+            list(response.context['page_obj']), [self.hot, self.quiet]
+        )
+        self.assertEqual(response.context['groups'], [self.group])
@@ -0,0 +1,81 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Post
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.in_text = Post.objects.create(
+            author=cls.author, text='Рыжие котики спят на солнце'
+        )
+        cls.in_comment = Post.objects.create(
+            author=cls.author, text='Прогулка по парку'
+        )
+        Comment.objects.create(
+            post=cls.in_comment, author=cls.author, text='Там был котик'
+        )
+        cls.other = Post.objects.create(
+            author=cls.author, text='Совсем другая тема'
+        )
+
+    def search(self, query):
+        response = Client().get(reverse('posts:search'), {'q': query})
+        return list(response.context['page_obj'])
+
+    def test_ranked_by_relevance(self):
+        """Находит по тексту и комментариям, текст поста важнее."""
+        self.assertEqual(self.search('котик'), [self.in_text, self.in_comment])
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется при правке и удалении постов."""
+        self.other.text = 'Теперь и тут котики'
+        self.other.save()
+        self.assertIn(self.other, self.search('котики'))
+        Post.objects.get(pk=self.in_text.pk).delete()
+        self.assertNotIn(self.in_text, self.search('котики'))
+
+    def test_comments_indexed_by_row(self):
+        """Комментарий меняет только свою строку индекса, удаление поста
+        с комментариями не переиндексирует пост."""
+        with CaptureQueriesContext(connection) as queries:
+            comment = Comment.objects.create(
+                post=self.other, author=self.author, text='Пушистый котик'
+            )
+        self.assertFalse([
+            query for query in queries if 'posts_post_search' in query['sql']
+        ])
+        self.assertIn(self.other, self.search('пушистый'))
+        comment.delete()
+        self.assertNotIn(self.other, self.search('пушистый'))
+        with CaptureQueriesContext(connection) as queries:
+            Post.objects.get(pk=self.in_comment.pk).delete()
+        self.assertEqual(len([
+            query for query in queries if '_search' in query['sql']
+        ]), 2)
+        self.assertEqual(self.search('котик'), [self.in_text])
+
+    def test_query_syntax_is_not_parsed(self):
+        """Кавычки и операторы в запросе не ломают поиск."""
+        for query in ('"котик', 'котик OR', 'NEAR(', '*', ''):
+            with self.subTest(query=query):
+                self.search(query)
+
+    def test_admin_search(self):
+        admin = User.objects.create_superuser('admin', 'admin@a.ru', 'pass')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'котик'}
+        )
+        self.assertEqual(
+            set(response.context['cl'].result_list),
+            {self.in_text, self.in_comment},
+        )
@@ -0,0 +1,120 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import default
+
+from ..models import Post, ThumbnailJob, User
+from ..thumbnails import (
+    DeferredThumbnailBackend, ThumbnailBatch, image_formats, process_jobs,
+)
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class DeferredThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='author')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(
+                name='small.gif', content=SMALL_GIF, content_type='image/gif'
+            ),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        default.kvstore.clear()
+        self.client = Client()
+
+    def test_placeholder_until_thumbnail_ready(self):
+        """Страница не режет картинку сама, а показывает заглушку."""
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        self.assertContains(self.client.get(url), 'data:image/svg+xml')
+        self.assertTrue(ThumbnailJob.objects.filter(
+            image=self.post.image.name
+        ).exists())
+        self.assertEqual(process_jobs(workers=0), 1)
+        self.assertFalse(ThumbnailJob.objects.exists())
+        response = self.client.get(url)
+        self.assertNotContains(response, 'data:image/svg+xml')
+        self.assertContains(response, settings.MEDIA_URL + 'cache/')
+
+    def test_srcset_derivatives(self):
+        """Воркер режет производные, страница отдаёт их в <picture>."""
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        self.assertNotContains(self.client.get(url), '<source')
+        process_jobs(workers=0)
+        response = self.client.get(url)
+        for format_ in image_formats():
+            self.assertContains(response, f'type="{Image.MIME[format_]}"')
+        for width in settings.POST_IMAGE_WIDTHS:
+            self.assertContains(response, f' {width}w')
+
+    def test_batch_reads_kvstore_once(self):
+        """Миниатюры страницы читаются одним запросом к KVStore."""
+        posts = [self.post] + [
+            Post.objects.create(
+                author=self.user, text=f'Копия {i}', image=self.post.image
+            )
+            for i in range(3)
+        ]
+        process_jobs(workers=0)
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            batch = ThumbnailBatch(posts, ['card'])
+        kvstore_queries = [
+            query for query in queries
+            if 'thumbnail_kvstore' in query['sql']
+        ]
+        self.assertEqual(len(kvstore_queries), 1)
+        for post in posts:
+            self.assertIn(
+                settings.MEDIA_URL + 'cache/', batch.get(post, 'card').url
+            )
+
+    def test_failed_image_not_requeued(self):
+        """Картинка, которую не удалось нарезать, выводится без миниатюры
+        и не ставится в очередь заново при каждом запросе."""
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        self.client.get(url)
+        with mock.patch.object(
+            DeferredThumbnailBackend, 'generate', side_effect=OSError
+        ):
+            for _ in range(settings.THUMBNAIL_MAX_ATTEMPTS):
+                self.assertEqual(process_jobs(workers=0), 1)
+            self.assertEqual(process_jobs(workers=0), 0)
+        job = ThumbnailJob.objects.get(image=self.post.image.name)
+        self.assertTrue(job.failed)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertNotContains(response, 'data:image/svg+xml')
+        self.assertFalse([
+            query for query in queries
+            if query['sql'].startswith('INSERT')
+        ])
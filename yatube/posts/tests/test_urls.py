@@ -37,6 +37,7 @@ class PostURLTests(TestCase):
                     f'{cls.post.id}',)): 'posts/post_detail.html',
             reverse('posts:post_edit', args=(
                     f'{cls.post.id}',)): 'posts/create_post.html',
+            reverse('posts:popular'): 'posts/popular.html',
         }
 
     def setUp(self):
@@ -1,10 +1,22 @@
+import re
+
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+
+from core.ratelimit import rate_limit_stats
+from posts.cards import card_stats
 from posts.forms import PostForm
-from posts.models import Follow, Group, Post, User
+from posts.models import (Comment, Follow, Group, Post, TimelineEntry,
+                          User)
+from posts.timeline import rebuild_timelines
+from posts.utils import encode_cursor
+
+from .utils import QueryBudgetMixin
 
 
 class PaginatorViewsTest(TestCase):
@@ -30,8 +42,12 @@ class PaginatorViewsTest(TestCase):
                 )
             )
         Post.objects.bulk_create(cls.posts)
+        # bulk_create обходит сигналы, ленты подписок собираем вручную.
+        rebuild_timelines()
 
     def setUp(self):
+        # bulk_create не шлёт сигналы, счётчики лент пересчитаются заново.
+        cache.clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
@@ -67,6 +83,55 @@ class PaginatorViewsTest(TestCase):
                         len(response.context['page_obj']),
                     )
 
+    def test_cursor_pages_follow_each_other(self):
+        """Курсоры ведут на следующую и обратно на предыдущую страницу."""
+        url = reverse('posts:index')
+        first = self.guest_client.get(url).context['page_obj']
+        self.assertEqual(len(first), settings.POST_COUNT)
+        self.assertTrue(first.has_next())
+        self.assertFalse(first.has_previous())
+        second = self.guest_client.get(
+            url, {'cursor': first.paginator.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(second.number, 2)
+        self.assertEqual(
+            len(second), settings.POST_COUNT_FOR_TEST - settings.POST_COUNT
+        )
+        self.assertFalse(second.has_next())
+        self.assertEqual(
+            [post.pk for post in first] + [post.pk for post in second],
+            list(Post.objects.order_by('-pub_date', '-pk')
+                 .values_list('pk', flat=True)),
+        )
+        back = self.guest_client.get(
+            url, {'cursor': second.paginator.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(back.number, 1)
+        self.assertEqual(list(back), list(first))
+
+    def test_broken_cursor_returns_first_page(self):
+        """Битый курсор не ломает страницу, а открывает первую."""
+        response = self.guest_client.get(
+            reverse('posts:profile', args=(self.user.username,)),
+            {'cursor': 'не-курсор'}
+        )
+        self.assertEqual(response.context['page_obj'].number, 1)
+        self.assertEqual(
+            len(response.context['page_obj']), settings.POST_COUNT
+        )
+
+    def test_out_of_range_cursor_returns_first_page(self):
+        """Курсор с числами вне диапазона базы тоже открывает первую."""
+        post = Post.objects.filter(author=self.user).first()
+        url = reverse('posts:profile', args=(self.user.username,))
+        for pk, number in ((10 ** 30, 2), (post.pk, 10 ** 30), (0, 2)):
+            with self.subTest(pk=pk, number=number):
+                post.pk = pk
+                response = self.guest_client.get(
+                    url, {'cursor': encode_cursor(post, number)}
+                )
+                self.assertEqual(response.context['page_obj'].number, 1)
+
 
 class PostsViewTests(TestCase):
     @classmethod
@@ -265,3 +330,620 @@ class FollowTest(TestCase):
         )
         post_object = response.context['page_obj']
         self.assertNotIn(post, post_object)
+
+
+class QueryBudgetTest(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='budget',
+            description='Тестовое описание',
+        )
+        for i in range(settings.POST_COUNT):
+            author = User.objects.create(username=f'author{i}')
+            Follow.objects.create(user=cls.reader, author=author)
+            group = Group.objects.create(
+                title=f'Группа {i}', slug=f'group{i}', description='-'
+            )
+            post = Post.objects.create(
+                text=f'Тестовый пост {i}', author=author, group=group
+            )
+            Comment.objects.create(
+                text='Комментарий', author=author, post=post
+            )
+            Post.objects.create(
+                text=f'Пост в группе {i}', author=author, group=cls.group
+            )
+        cls.post = post
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_pages_fit_query_budget(self):
+        """Число запросов страниц не растёт с числом постов."""
+        pages = (
+            (self.guest_client, reverse('posts:index'), 1),
+            (self.guest_client, reverse(
+                'posts:group_list', args=(self.group.slug,)), 2),
+            (self.guest_client, reverse(
+                'posts:profile', args=(self.post.author.username,)), 2),
+            (self.guest_client, reverse(
+                'posts:post_detail', args=(self.post.pk,)), 3),
+            # Ключи записей ленты, посты популярных авторов, сами посты.
+            (self.reader_client, reverse('posts:follow_index'), 5),
+        )
+        for client, url, budget in pages:
+            with self.subTest(url=url):
+                self.assertQueryBudget(client, url, budget)
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.reader = User.objects.create(username='reader')
+        cls.old_post = Post.objects.create(
+            text='Старый пост', author=cls.author
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def follow_page(self):
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_timeline_follows_subscriptions(self):
+        """Подписка дописывает ленту, пост рассылается, отписка чистит."""
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.follow_page(), [self.old_post])
+        new_post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertEqual(self.follow_page(), [new_post, self.old_post])
+        follow.delete()
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader))
+        self.assertEqual(self.follow_page(), [])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_popular_author_read_on_request(self):
+        """Посты популярных авторов не рассылаются, но видны в ленте."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader))
+        self.assertEqual(self.follow_page(), [new_post, self.old_post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1, NUMBER_POSTS=2)
+    def test_cursor_merges_fanned_out_and_popular(self):
+        """Курсор листает разосланные посты вперемешку с постами
+        популярного автора в обе стороны."""
+        star = User.objects.create(username='star')
+        Follow.objects.create(user=self.author, author=star)
+        Follow.objects.create(user=self.reader, author=star)
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [self.old_post]
+        for i in range(4):
+            posts.append(Post.objects.create(text=f'Звезда {i}', author=star))
+            posts.append(
+                Post.objects.create(text=f'Автор {i}', author=self.author)
+            )
+        posts.reverse()
+        seen, pages, params = [], [], {}
+        while True:
+            response = self.reader_client.get(
+                reverse('posts:follow_index'), params
+            )
+            page = response.context['page_obj']
+            pages.append((params, list(page)))
+            seen += page
+            if not page.has_next():
+                break
+            params = {'cursor': page.paginator.next_cursor}
+        self.assertEqual(seen, posts)
+        response = self.reader_client.get(
+            reverse('posts:follow_index'),
+            {'cursor': page.paginator.previous_cursor},
+        )
+        self.assertEqual(list(response.context['page_obj']), pages[-2][1])
+
+
+class AnonymousPageCacheTest(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='cached',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост', author=cls.user, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.user.username,)),
+            reverse('posts:post_detail', args=(self.post.pk,)),
+        )
+
+    def test_anonymous_pages_served_from_cache(self):
+        """Повторный анонимный запрос не рендерит страницу заново."""
+        for url in self.pages:
+            with self.subTest(url=url):
+                first = self.guest_client.get(url)
+                second = self.assertQueryBudget(self.guest_client, url, 1)
+                self.assertIsNone(second.context)
+                self.assertEqual(first.content, second.content)
+
+    def test_authorized_pages_not_cached(self):
+        """Авторизованным страница рендерится всегда."""
+        url = reverse('posts:index')
+        self.authorized_client.get(url)
+        self.assertIsNotNone(self.authorized_client.get(url).context)
+
+    def test_writes_invalidate_related_pages(self):
+        """Запись сбрасывает только зависящие от неё страницы."""
+        for url in self.pages:
+            self.guest_client.get(url)
+        Comment.objects.create(
+            text='Новый комментарий', author=self.user, post=self.post
+        )
+        detail = self.guest_client.get(self.pages[3])
+        self.assertContains(detail, 'Новый комментарий')
+        self.assertIsNone(self.guest_client.get(self.pages[0]).context)
+        self.post.text = 'Исправленный пост'
+        self.post.save()
+        # Лента на главной ещё и во фрагментном кэше шаблона на 20 секунд.
+        for url in self.pages[1:]:
+            with self.subTest(url=url):
+                self.assertContains(
+                    self.guest_client.get(url), 'Исправленный пост'
+                )
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='cards',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост', author=cls.user, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_cards_reused_across_feeds(self):
+        """Карточка, отрендеренная в одной ленте, берётся из кэша в другой."""
+        self.authorized_client.get(
+            reverse('posts:group_list', args=(self.group.slug,))
+        )
+        self.assertEqual(card_stats()['misses'], 1)
+        self.authorized_client.get(reverse('posts:follow_index'))
+        self.authorized_client.get(reverse('posts:index'))
+        self.assertEqual(card_stats()['hits'], 1)
+
+    def test_edit_bumps_card_version(self):
+        """Правка поста сбрасывает его карточку."""
+        url = reverse('posts:group_list', args=(self.group.slug,))
+        self.authorized_client.get(url)
+        self.authorized_client.post(
+            reverse('posts:post_edit', args=(self.post.pk,)),
+            {'text': 'Исправленный пост', 'group': self.group.pk},
+        )
+        self.assertContains(self.authorized_client.get(url),
+                            'Исправленный пост')
+
+
+@override_settings(COMMENTS_PER_PAGE=5)
+class CommentPaginationTest(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.post = Post.objects.create(
+            text='Популярный пост', author=User.objects.create(username='a')
+        )
+        for i in range(12):
+            Comment.objects.create(
+                text=f'Комментарий {i}', post=cls.post,
+                author=User.objects.create(username=f'commenter{i}'),
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_detail_renders_first_page(self):
+        """Страница поста показывает только первые комментарии,
+        запросы не зависят от числа комментаторов."""
+        response = self.assertQueryBudget(
+            self.guest_client,
+            reverse('posts:post_detail', args=(self.post.pk,)), 3,
+        )
+        self.assertEqual(
+            [c.text for c in response.context['comments']],
+            [f'Комментарий {i}' for i in range(11, 6, -1)],
+        )
+        self.assertContains(response, 'Показать ещё комментарии')
+
+    def test_load_more(self):
+        """Фрагмент отдаёт следующие страницы до конца."""
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        cursor = self.guest_client.get(url).context['comments'].paginator
+        url = (reverse('posts:post_comments', args=(self.post.pk,))
+               + f'?cursor={cursor.next_cursor}')
+        texts = []
+        while url:
+            data = self.guest_client.get(url).json()
+            texts += [
+                line.strip() for line in data['html'].splitlines()
+                if line.strip().startswith('Комментарий')
+            ]
+            url = data['next']
+        self.assertEqual(
+            texts, [f'Комментарий {i}' for i in range(6, -1, -1)]
+        )
+
+
+@override_settings(COMMENT_THREAD_DEPTH=2, COMMENT_MAX_DEPTH=4)
+class CommentThreadTest(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='commenter')
+        cls.post = Post.objects.create(text='Пост с тредом', author=cls.user)
+        cls.chain = []
+        parent = None
+        for depth in range(5):
+            parent = Comment.objects.create(
+                text=f'Уровень {depth}', post=cls.post, author=cls.user,
+                parent=parent,
+            )
+            cls.chain.append(parent)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_depth_limited(self):
+        """Ответ на самом глубоком уровне становится соседом."""
+        self.assertEqual(
+            [c.depth for c in Comment.objects.order_by('pk')],
+            [0, 1, 2, 3, 4],
+        )
+        self.assertEqual(self.chain[4].parent, self.chain[3])
+        reply = Comment.objects.create(
+            text='Ещё глубже', post=self.post, author=self.user,
+            parent=self.chain[4],
+        )
+        self.assertEqual(reply.depth, 4)
+        self.assertEqual(reply.parent, self.chain[3])
+
+    def test_thread_collapsed_below_depth(self):
+        """Страница поста раскрывает тред на COMMENT_THREAD_DEPTH уровней
+        по запросу на уровень, остальное отдаёт фрагмент ветки."""
+        response = self.assertQueryBudget(
+            Client(), reverse('posts:post_detail', args=(self.post.pk,)), 5,
+        )
+        root, = response.context['comments']
+        self.assertEqual(root.thread[0].thread[0], self.chain[2])
+        self.assertEqual(root.thread[0].thread[0].thread, [])
+        self.assertContains(response, 'Показать ответы (2)')
+        data = Client().get(reverse(
+            'posts:comment_thread', args=(self.post.pk, self.chain[2].pk)
+        )).json()
+        self.assertIn('Уровень 3', data['html'])
+        self.assertIn('Уровень 4', data['html'])
+
+    @override_settings(COMMENT_REPLIES_PER_PAGE=3)
+    def test_wide_thread_capped(self):
+        """У комментария раскрыто COMMENT_REPLIES_PER_PAGE ответов,
+        остальные догружаются по курсору ?after=."""
+        root = self.chain[0]
+        Comment.objects.bulk_create(
+            Comment(text=f'Ответ {i}', post=self.post, author=self.user,
+                    parent=root, depth=1)
+            for i in range(50)
+        )
+        for reply in Comment.objects.filter(parent=root, path=''):
+            reply.path = root.path + f'{reply.pk:010d}/'
+            reply.save(update_fields=['path'])
+        Comment.objects.filter(pk=root.pk).update(reply_count=54)
+        response = Client().get(
+            reverse('posts:post_detail', args=(self.post.pk,))
+        )
+        root, = response.context['comments']
+        self.assertEqual(len(root.thread), 3)
+        self.assertTrue(root.more_replies)
+        self.assertContains(response, 'Показать ещё ответы')
+        shown = [reply.pk for reply in root.thread]
+        url = '{}?after={}'.format(
+            reverse('posts:comment_thread', args=(self.post.pk, root.pk)),
+            shown[-1],
+        )
+        while url:
+            data = Client().get(url).json()
+            shown += [int(pk) for pk in re.findall(
+                r'id="comment-(\d+)"', data['html']
+            )]
+            url = data['next']
+        direct = list(Comment.objects.filter(
+            parent=root
+        ).order_by('pk').values_list('pk', flat=True))
+        self.assertEqual([pk for pk in shown if pk in direct], direct)
+
+    @override_settings(COMMENT_REPLIES_BUDGET=2)
+    def test_reply_budget(self):
+        """На всей странице раскрыто не больше COMMENT_REPLIES_BUDGET
+        ответов, остальные ветки свёрнуты."""
+        root = self.chain[0]
+        for i in range(3):
+            Comment.objects.create(
+                text=f'Ответ {i}', post=self.post, author=self.user,
+                parent=root,
+            )
+        response = Client().get(
+            reverse('posts:post_detail', args=(self.post.pk,))
+        )
+        root, = response.context['comments']
+        self.assertEqual(len(root.thread), 2)
+        self.assertTrue(root.more_replies)
+        self.assertEqual([reply.thread for reply in root.thread], [[], []])
+        self.assertContains(response, 'Показать ответы (3)')
+
+    def test_bad_reply_cursor(self):
+        """Нечисловой или огромный ?after= не роняет фрагмент ветки."""
+        url = reverse(
+            'posts:comment_thread', args=(self.post.pk, self.chain[0].pk)
+        )
+        for after in ('²', '9' * 30, '-1', 'abc'):
+            with self.subTest(after=after):
+                response = Client().get(url, {'after': after})
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('Уровень 1', response.json()['html'])
+
+    def test_bad_reply_parent(self):
+        """Негодный parent сохраняет комментарий корневым."""
+        url = reverse('posts:add_comment', args=(self.post.pk,))
+        for parent in ('²', '9' * 30):
+            with self.subTest(parent=parent):
+                response = self.authorized_client.post(
+                    url, {'text': f'Корень {parent}', 'parent': parent}
+                )
+                self.assertEqual(response.status_code, 302)
+                self.assertIsNone(
+                    Comment.objects.get(text=f'Корень {parent}').parent
+                )
+
+    def test_reply(self):
+        """Ответ привязывается к комментарию того же поста."""
+        url = reverse('posts:add_comment', args=(self.post.pk,))
+        self.authorized_client.post(
+            url, {'text': 'Ответ', 'parent': self.chain[0].pk}
+        )
+        reply = Comment.objects.get(text='Ответ')
+        self.assertEqual(reply.parent, self.chain[0])
+        self.assertEqual(reply.path, self.chain[0].path + f'{reply.pk:010d}/')
+        other = Post.objects.create(text='Другой пост', author=self.user)
+        response = self.authorized_client.post(
+            reverse('posts:add_comment', args=(other.pk,)),
+            {'text': 'Чужой тред', 'parent': self.chain[0].pk},
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(RATE_LIMITS={'add_comment': (2, 60), 'follow': (1, 60)})
+class RateLimitTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='spammer')
+        cls.author = User.objects.create(username='author')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_writes_throttled(self):
+        """Сверх ведра запись отклоняется с 429 до работы с постами."""
+        url = reverse('posts:add_comment', args=(self.post.pk,))
+        for _ in range(2):
+            response = self.authorized_client.post(url, {'text': 'Спам'})
+            self.assertEqual(response.status_code, 302)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.post(url, {'text': 'Спам'})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if 'posts_' in query['sql'] or 'auth_user' in query['sql']
+        ])
+        self.assertEqual(Comment.objects.count(), 2)
+        self.assertEqual(
+            rate_limit_stats()['add_comment'],
+            {'allowed': 2, 'rejected': 1},
+        )
+
+    def test_limits_per_user_and_endpoint(self):
+        """Лимиты считаются отдельно для пользователей и view."""
+        follow = reverse('posts:profile_follow', args=(self.author.username,))
+        self.assertEqual(self.authorized_client.get(follow).status_code, 302)
+        self.assertEqual(self.authorized_client.get(follow).status_code, 429)
+        other = Client()
+        other.force_login(self.author)
+        self.assertEqual(
+            other.get(reverse(
+                'posts:profile_follow', args=(self.user.username,)
+            )).status_code, 302,
+        )
+        self.assertEqual(self.authorized_client.post(
+            reverse('posts:add_comment', args=(self.post.pk,)),
+            {'text': 'Комментарий'},
+        ).status_code, 302)
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='author')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_unchanged_page_not_modified(self):
+        """Повторный запрос неизменившейся ленты получает 304 без
+        обращения к базе."""
+        url = reverse('posts:index')
+        response = self.guest_client.get(url)
+        self.assertTrue(response.has_header('Last-Modified'))
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag']
+            )
+        self.assertEqual(response.status_code, 304)
+        self.assertNotEqual(
+            self.authorized_client.get(url)['ETag'],
+            self.guest_client.get(url)['ETag'],
+        )
+
+    def test_login_changes_etag(self):
+        """Новый вход меняет CSRF-токен, и страница с формами
+        не отдаётся из кэша браузера со старым токеном."""
+        User.objects.create_user('reader', password='pass')
+        client = Client()
+        credentials = {'username': 'reader', 'password': 'pass'}
+        client.post(reverse('users:login'), credentials)
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        etag = client.get(url)['ETag']
+        self.assertEqual(
+            client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+        client.get(reverse('users:logout'))
+        client.post(reverse('users:login'), credentials)
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_edit_changes_validators(self):
+        """Правка поста меняет ETag страницы и дату изменения."""
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        etag = self.guest_client.get(url)['ETag']
+        updated = Post.objects.get(pk=self.post.pk).updated
+        self.authorized_client.post(
+            reverse('posts:post_edit', args=(self.post.pk,)),
+            {'text': 'Исправленный пост'},
+        )
+        self.assertGreater(Post.objects.get(pk=self.post.pk).updated, updated)
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Исправленный пост')
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='api', description='-'
+        )
+        for i in range(settings.NUMBER_POSTS + 3):
+            cls.post = Post.objects.create(
+                text=f'Пост {i}', author=cls.author, group=cls.group
+            )
+        Comment.objects.create(text='Комментарий', author=cls.reader,
+                               post=cls.post)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_feeds_mirror_pages(self):
+        """API отдаёт те же посты, что и HTML-страницы, по курсору."""
+        pages = (
+            ('posts:index', 'posts:api_index', ()),
+            ('posts:group_list', 'posts:api_group_list', (self.group.slug,)),
+            ('posts:profile', 'posts:api_profile', (self.author.username,)),
+            ('posts:follow_index', 'posts:api_follow_index', ()),
+        )
+        for page, api, args in pages:
+            with self.subTest(api=api):
+                html = self.reader_client.get(reverse(page, args=args))
+                data = self.reader_client.get(reverse(api, args=args)).json()
+                self.assertEqual(
+                    [post['id'] for post in data['results']],
+                    [post.pk for post in html.context['page_obj']],
+                )
+                rest = self.reader_client.get(data['next']).json()
+                self.assertEqual(len(rest['results']), 3)
+                self.assertIsNone(rest['next'])
+
+    def test_post_detail(self):
+        data = self.guest_client.get(
+            reverse('posts:api_post_detail', args=(self.post.pk,))
+        ).json()
+        self.assertEqual(data['post']['author'], 'author')
+        self.assertEqual(data['post']['group'], 'api')
+        self.assertEqual(data['comments']['results'][0]['text'],
+                         'Комментарий')
+
+    def test_comment_count_not_stale(self):
+        """Счётчик комментариев есть только у поста, чей ETag
+        сбрасывается новым комментарием."""
+        feed = self.guest_client.get(reverse('posts:api_index'))
+        self.assertNotIn('comment_count', feed.json()['results'][0])
+        url = reverse('posts:api_post_detail', args=(self.post.pk,))
+        etag = self.guest_client.get(url)['ETag']
+        Comment.objects.create(text='Ещё', author=self.reader,
+                               post=self.post)
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['post']['comment_count'], 2)
+
+    def test_follow_requires_login(self):
+        response = self.guest_client.get(reverse('posts:api_follow_index'))
+        self.assertEqual(response.status_code, 401)
+
+    def test_compressed(self):
+        """Ответ сжимается gzip, ETag становится слабым."""
+        response = self.guest_client.get(
+            reverse('posts:api_index'), HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertTrue(response['ETag'].startswith('W/'))
+        self.assertEqual(self.guest_client.get(
+            reverse('posts:api_index'), HTTP_ACCEPT_ENCODING='gzip',
+            HTTP_IF_NONE_MATCH=response['ETag'],
+        ).status_code, 304)
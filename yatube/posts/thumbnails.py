@@ -0,0 +1,356 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import close_old_connections
+from django.db.models import F
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.base import EXTENSIONS, ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.kvstores.cached_db_kvstore import \
+    KVStore as CachedDBKVStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+from sorl.thumbnail.parsers import parse_geometry
+
+from .models import Post, ThumbnailJob
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER_PREFIX = 'data:image/svg+xml,'
+PLACEHOLDER_SVG = (
+    '<svg xmlns="http://www.w3.org/2000/svg" width="{0}" height="{1}">'
+    '<rect width="100%" height="100%" fill="#e9ecef"/></svg>'
+)
+
+
+class Placeholder:
+    """Заглушка на месте миниатюры, которая ещё готовится."""
+
+    def __init__(self, geometry_string):
+        width, height = parse_geometry(geometry_string)
+        self.width = width or height
+        self.height = height or width
+        self.url = PLACEHOLDER_PREFIX + quote(
+            PLACEHOLDER_SVG.format(self.width, self.height)
+        )
+
+    def exists(self):
+        return False
+
+
+def has_placeholder(content):
+    """Есть ли в отрендеренном HTML заглушка вместо миниатюры.
+
+    Такие страницы и карточки не кэшируются, чтобы заглушка
+    не пережила готовую миниатюру.
+    """
+    if isinstance(content, bytes):
+        return PLACEHOLDER_PREFIX.encode() in content
+    return PLACEHOLDER_PREFIX in content
+
+
+def image_formats():
+    """Форматы производных из settings.POST_IMAGE_FORMATS.
+
+    Форматы, которые не умеют сохранять Pillow или sorl-thumbnail,
+    пропускаются.
+    """
+    Image.init()
+    return [
+        format_ for format_ in settings.POST_IMAGE_FORMATS
+        if format_ in Image.SAVE and format_ in EXTENSIONS
+    ]
+
+
+def thumbnail_specs():
+    """Все миниатюры поста: {(размер, ширина, формат): (геометрия, опции)}.
+
+    Размеры из settings.POST_THUMBNAILS идут с шириной и форматом None,
+    их производные для srcset — с шириной из settings.POST_IMAGE_WIDTHS
+    и форматом из image_formats().
+    """
+    specs = {}
+    for size, (geometry_string, options) in settings.POST_THUMBNAILS.items():
+        specs[size, None, None] = (geometry_string, options)
+        width, height = parse_geometry(geometry_string)
+        for format_ in image_formats():
+            for variant_width in settings.POST_IMAGE_WIDTHS:
+                if width and variant_width > width:
+                    continue
+                geometry = str(variant_width)
+                if width and height:
+                    geometry += f'x{round(height * variant_width / width)}'
+                specs[size, variant_width, format_] = (
+                    geometry, {**options, 'format': format_}
+                )
+    return specs
+
+
+class DeferredThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl-thumbnail, который не режет картинки во время запроса.
+
+    Миниатюры из thumbnail_specs() берутся из key-value
+    store, а пока их нет, отдаётся Placeholder и картинка ставится
+    в очередь воркеру thumbnail_worker, а для картинки, которую воркер
+    нарезать не смог, — None. Прочие размеры режутся как обычно.
+    """
+
+    def normalize_options(self, source, options):
+        """Те же опции по умолчанию, что добавляет ThumbnailBackend."""
+        options = dict(options)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        return options
+
+    def thumbnail_file(self, file_, geometry_string, **options):
+        """ImageFile миниатюры без обращения к хранилищу и key-value store."""
+        source = ImageFile(file_)
+        name = self._get_thumbnail_filename(
+            source, geometry_string, self.normalize_options(source, options)
+        )
+        return ImageFile(name, default.storage)
+
+    def get_cached_thumbnail(self, file_, geometry_string, **options):
+        return default.kvstore.get(
+            self.thumbnail_file(file_, geometry_string, **options)
+        )
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if (geometry_string, options) not in thumbnail_specs().values():
+            return super().get_thumbnail(file_, geometry_string, **options)
+        cached = self.get_cached_thumbnail(file_, geometry_string, **options)
+        if cached:
+            return cached
+        name = getattr(file_, 'name', file_)
+        if failed_images([name]):
+            return None
+        schedule(name)
+        return Placeholder(geometry_string)
+
+    def generate(self, file_, geometry_string, **options):
+        return super().get_thumbnail(file_, geometry_string, **options)
+
+
+def read_kvstore(keys):
+    """Сырые значения key-value store sorl-thumbnail по списку ключей.
+
+    Для cached_db хранилища это один get_many кэша и один запрос
+    к таблице на все промахи, прочие хранилища читаются по ключу.
+    """
+    kvstore = default.kvstore
+    if not isinstance(kvstore, CachedDBKVStore):
+        values = {key: kvstore._get_raw(key) for key in keys}
+        return {key: value for key, value in values.items() if value}
+    values = kvstore.cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        found = dict(KVStoreModel.objects.filter(
+            key__in=missing
+        ).values_list('key', 'value'))
+        kvstore.cache.set_many(
+            {key: found.get(key, EMPTY_VALUE) for key in missing},
+            sorl_settings.THUMBNAIL_CACHE_TIMEOUT,
+        )
+        values.update(found)
+    return {
+        key: value for key, value in values.items()
+        if value and value != EMPTY_VALUE
+    }
+
+
+class ThumbnailBatch:
+    """Миниатюры страницы постов, прочитанные из key-value store разом.
+
+    Вместо отдельного чтения на каждый тег ключи всех постов, размеров
+    и их производных собираются заранее и читаются через read_kvstore.
+    Готовой миниатюры нет — картинка ставится в очередь,
+    а на её месте показывается Placeholder. Картинки, которые воркер
+    нарезать не смог, выводятся без миниатюры и в очередь не ставятся,
+    чтобы страница с ними кэшировалась.
+    """
+
+    def __init__(self, posts, sizes=None):
+        sizes = set(sizes or settings.POST_THUMBNAILS)
+        self.specs = {
+            spec: value for spec, value in thumbnail_specs().items()
+            if spec[0] in sizes
+        }
+        backend = DeferredThumbnailBackend()
+        self.keys = {}
+        for post in posts:
+            if not post.image:
+                continue
+            for spec, (geometry_string, options) in self.specs.items():
+                thumbnail = backend.thumbnail_file(
+                    post.image, geometry_string, **options
+                )
+                self.keys[post.image.name, spec] = add_prefix(thumbnail.key)
+        self.values = read_kvstore(list(set(self.keys.values())))
+        self.failed = failed_images({
+            name for (name, _), key in self.keys.items()
+            if key not in self.values
+        })
+
+    def has(self, post, size):
+        return (post.image.name, (size, None, None)) in self.keys
+
+    def _image(self, post, spec):
+        value = self.values.get(self.keys.get((post.image.name, spec)))
+        return deserialize_image_file(value) if value else None
+
+    def get(self, post, size):
+        if not post.image or post.image.name in self.failed:
+            return None
+        image = self._image(post, (size, None, None))
+        if image is None:
+            schedule(post.image.name)
+            return Placeholder(self.specs[size, None, None][0])
+        return image
+
+    def sources(self, post, size):
+        """<source> для <picture>: MIME-тип и srcset каждого формата.
+
+        Формат попадает в разметку, только когда готовы все его ширины.
+        """
+        if not post.image or self._image(post, (size, None, None)) is None:
+            return []
+        sources = []
+        for format_ in image_formats():
+            variants = [
+                (spec[1], self._image(post, spec))
+                for spec in self.specs
+                if spec[0] == size and spec[2] == format_
+            ]
+            if not all(image for _, image in variants):
+                if post.image.name not in self.failed:
+                    schedule(post.image.name)
+                continue
+            if variants:
+                sources.append({
+                    'type': Image.MIME[format_],
+                    'srcset': ', '.join(
+                        f'{image.url} {width}w' for width, image in variants
+                    ),
+                })
+        return sources
+
+
+def schedule(name):
+    """Ставит картинку в очередь на миниатюры, повтор не дублируется."""
+    ThumbnailJob.objects.bulk_create(
+        [ThumbnailJob(image=name)], ignore_conflicts=True
+    )
+
+
+def failed_images(names):
+    """Имена из names, миниатюры которых воркер нарезать не смог.
+
+    Пустой names обходится без запроса.
+    """
+    if not names:
+        return set()
+    return set(ThumbnailJob.objects.filter(
+        image__in=names, failed=True
+    ).values_list('image', flat=True))
+
+
+def retry_failed():
+    """Возвращает неудавшиеся картинки в очередь, возвращает их число."""
+    return ThumbnailJob.objects.filter(failed=True).update(
+        failed=False, attempts=0
+    )
+
+
+def image_file(name):
+    """ImageFile картинки поста в хранилище поля Post.image.
+
+    Ключи миниатюр в key-value store зависят от класса хранилища,
+    поэтому картинку нельзя открывать по одному имени.
+    """
+    return ImageFile(name, Post._meta.get_field('image').storage)
+
+
+def generate_thumbnails(name):
+    """Режет все миниатюры и производные из thumbnail_specs().
+
+    После успеха задача удаляется, после ошибки остаётся в очереди
+    с увеличенным счётчиком попыток, исчерпав их — помечается failed.
+    Страницы с заглушкой не кэшируются, так что после ошибки
+    сбрасывать нечего.
+    """
+    # page_cache сам импортирует этот модуль ради has_placeholder.
+    from .page_cache import invalidate_post_pages
+    backend = DeferredThumbnailBackend()
+    jobs = ThumbnailJob.objects.filter(image=name)
+    try:
+        for geometry_string, options in thumbnail_specs().values():
+            backend.generate(image_file(name), geometry_string, **options)
+        for post in Post.objects.filter(image=name).select_related('author'):
+            invalidate_post_pages(post, post.group_id)
+    except Exception:
+        logger.exception('Не удалось подготовить миниатюры для %s', name)
+        jobs.update(attempts=F('attempts') + 1)
+        jobs.filter(
+            attempts__gte=settings.THUMBNAIL_MAX_ATTEMPTS
+        ).update(failed=True)
+    else:
+        jobs.delete()
+
+
+def collect_image(name):
+    """Удаляет картинку с миниатюрами, если на неё не ссылается ни один пост.
+
+    Одинаковые загрузки хранятся одним файлом, поэтому ссылками
+    на него служат строки Post с тем же именем.
+    """
+    if not name or Post.objects.filter(image=name).exists():
+        return False
+    ThumbnailJob.objects.filter(image=name).delete()
+    try:
+        DeferredThumbnailBackend().delete(image_file(name))
+    except SuspiciousFileOperation:
+        # Имя вне MEDIA_ROOT: такой файл хранилищу не принадлежит.
+        return False
+    return True
+
+
+def _generate_in_worker(name):
+    try:
+        generate_thumbnails(name)
+    finally:
+        close_old_connections()
+
+
+def process_jobs(workers=None, limit=None):
+    """Разбирает очередь пулом потоков, возвращает число картинок.
+
+    workers=0 режет картинки в текущем потоке.
+    """
+    if workers is None:
+        workers = settings.THUMBNAIL_WORKERS
+    jobs = ThumbnailJob.objects.filter(failed=False).order_by(
+        'attempts', 'created'
+    ).values_list('image', flat=True)
+    names = list(jobs[:limit or settings.THUMBNAIL_BATCH_SIZE])
+    if not workers:
+        for name in names:
+            generate_thumbnails(name)
+    elif names:
+        with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='thumbnails'
+        ) as executor:
+            list(executor.map(_generate_in_worker, names))
+    return len(names)
@@ -0,0 +1,91 @@
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.db import transaction
+
+from .models import AuthorStats, Follow, Post, TimelineEntry
+
+
+def is_popular(author_id):
+    """Посты популярных авторов не рассылаются, а читаются при запросе."""
+    return AuthorStats.objects.filter(
+        user_id=author_id,
+        followers__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).exists()
+
+
+def _store(entries):
+    TimelineEntry.objects.bulk_create(
+        entries,
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def fan_out(post):
+    """Раскладывает новый пост в ленты подписчиков автора."""
+    if is_popular(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    _store(
+        TimelineEntry(user_id=user_id, author_id=post.author_id, post=post,
+                      pub_date=post.pub_date)
+        for user_id in followers.iterator()
+    )
+
+
+def backfill(follow):
+    """Добавляет в ленту нового подписчика уже опубликованные посты."""
+    if is_popular(follow.author_id):
+        return
+    posts = Post.objects.filter(
+        author_id=follow.author_id
+    ).values_list('pk', 'pub_date')
+    _store(
+        TimelineEntry(
+            user_id=follow.user_id, author_id=follow.author_id, post_id=pk,
+            pub_date=pub_date,
+        )
+        for pk, pub_date in posts.iterator()
+    )
+
+
+def prune(follow):
+    """Убирает посты автора из ленты отписавшегося."""
+    TimelineEntry.objects.filter(
+        user_id=follow.user_id, author_id=follow.author_id
+    ).delete()
+
+
+def rebuild_timelines(apps=django_apps):
+    """Собирает ленты подписок заново по таблице подписок.
+
+    Нужна после массовых записей в обход сигналов (bulk_create,
+    update) и для авторов, переставших быть популярными.
+    """
+    entry_model = apps.get_model('posts', 'TimelineEntry')
+    follow_model = apps.get_model('posts', 'Follow')
+    post_model = apps.get_model('posts', 'Post')
+    popular = apps.get_model('posts', 'AuthorStats').objects.filter(
+        followers__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).values('user')
+    follows = follow_model.objects.exclude(
+        author__in=popular
+    ).values_list('user_id', 'author_id')
+    fields = {field.name for field in entry_model._meta.get_fields()}
+    # В миграциях до 0016 у записей ленты ещё нет даты публикации.
+    dated = 'pub_date' in fields
+    with transaction.atomic():
+        entry_model.objects.all().delete()
+        for user_id, author_id in follows.iterator():
+            posts = post_model.objects.filter(
+                author_id=author_id
+            ).values_list('pk', 'pub_date')
+            entry_model.objects.bulk_create(
+                (entry_model(user_id=user_id, author_id=author_id,
+                             post_id=pk,
+                             **({'pub_date': pub_date} if dated else {}))
+                 for pk, pub_date in posts.iterator()),
+                batch_size=settings.TIMELINE_BATCH_SIZE,
+            )
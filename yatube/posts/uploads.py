@@ -0,0 +1,122 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.temp import NamedTemporaryFile
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps
+
+JPEG_QUALITY = 90
+# Формат для картинок, которые Pillow не умеет записывать как есть.
+CONVERT_FORMAT = 'PNG'
+PNG_MODES = ('1', 'L', 'LA', 'I', 'P', 'RGB', 'RGBA')
+# Служебные поля, без которых картинка сохранится неправильно;
+# EXIF, XMP, комментарии и прочие метаданные не переносятся.
+KEEP_INFO = ('transparency', 'duration', 'loop', 'background', 'icc_profile')
+
+
+class RejectedUpload(UploadedFile):
+    """Файл, отброшенный ImageUploadLimitHandler: вместо содержимого
+    в нём только причина для формы."""
+
+    def __init__(self, name, content_type, error):
+        super().__init__(None, name, content_type, 0)
+        self.upload_error = error
+
+
+def check_pixels(width, height):
+    """Сообщение об ошибке, если в картинке слишком много пикселей."""
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        return 'Картинка больше {} мегапикселей.'.format(
+            settings.POST_IMAGE_MAX_PIXELS // 10 ** 6
+        )
+    return None
+
+
+class ImageUploadLimitHandler(FileUploadHandler):
+    """Отбрасывает загрузки больше settings.POST_IMAGE_MAX_SIZE байт
+    и картинки больше settings.POST_IMAGE_MAX_PIXELS пикселей.
+
+    Стоит первым в FILE_UPLOAD_HANDLERS и пропускает куски дальше
+    стандартным обработчикам, пока файл укладывается в лимиты. Размер
+    картинки берётся из заголовка в первом куске, без разжатия. Остаток
+    отброшенного файла вычитывается из запроса без записи, а в
+    request.FILES попадает RejectedUpload.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.error = None
+
+    def check_header(self, head):
+        try:
+            with Image.open(BytesIO(head)) as image:
+                return check_pixels(*image.size)
+        except Image.DecompressionBombError:
+            return check_pixels(Image.MAX_IMAGE_PIXELS * 2, 1)
+        except Exception:
+            # Не картинка или заголовок не уместился в кусок:
+            # решат ImageField и PostForm.clean_image.
+            return None
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.error is None and start == 0:
+            self.error = self.check_header(raw_data)
+        if (self.error is None
+                and start + len(raw_data) > settings.POST_IMAGE_MAX_SIZE):
+            self.error = 'Файл больше {}.'.format(
+                filesizeformat(settings.POST_IMAGE_MAX_SIZE)
+            )
+        if self.error:
+            return None
+        return raw_data
+
+    def file_complete(self, file_size):
+        if self.error is None:
+            return None
+        return RejectedUpload(self.file_name, self.content_type, self.error)
+
+
+def strip_metadata(upload):
+    """Пересохраняет загруженную картинку без метаданных.
+
+    Новое содержимое пишется во временный файл на диске и подменяет
+    файл загрузки, откуда хранилище переносит его в MEDIA_ROOT
+    кусками. Поворот из EXIF применяется к пикселям, поэтому после
+    удаления EXIF картинка не ложится на бок. Форматы, которые Pillow
+    читает, но записать не может (XPM, PSD, CUR…), сохраняются в PNG.
+    """
+    Image.init()
+    upload.seek(0)
+    clean = NamedTemporaryFile(
+        suffix='.upload', dir=settings.FILE_UPLOAD_TEMP_DIR
+    )
+    with Image.open(upload) as image:
+        format_ = image.format
+        animated = getattr(image, 'is_animated', False)
+        if format_ not in Image.SAVE:
+            format_ = CONVERT_FORMAT
+            if image.mode not in PNG_MODES:
+                image = image.convert(
+                    'RGBA' if 'A' in image.getbands() else 'RGB'
+                )
+            upload.name = os.path.splitext(upload.name)[0] + '.png'
+            upload.content_type = 'image/png'
+        info = {
+            key: value for key, value in image.info.items()
+            if key in KEEP_INFO
+        }
+        if not animated:
+            image = ImageOps.exif_transpose(image)
+        image.info = info
+        image.save(
+            clean, format=format_, save_all=animated, quality=JPEG_QUALITY,
+            icc_profile=info.get('icc_profile'),
+        )
+    upload.file.close()
+    upload.file = clean
+    upload.size = clean.tell()
+    upload.seek(0)
+    return upload
@@ -1,8 +1,284 @@
+import base64
+import binascii
+import json
+
 from django.conf import settings
-from django.core.paginator import Paginator
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from .counters import feed_key, get_feed_count
+from .models import Comment, Post, TimelineEntry, popular_follows
+
+FORWARD = 'n'
+BACKWARD = 'p'
+# Наибольшее значение целого в SQLite и bigint в других базах.
+MAX_ID = 2 ** 63 - 1
+
+
+def encode_cursor(row, number, direction=FORWARD):
+    """Упаковывает ключ (pub_date, id) записи в непрозрачный токен.
+
+    row — объект модели или словарь из .values() с pub_date и id.
+    """
+    if isinstance(row, dict):
+        pub_date, pk = row['pub_date'], row['id']
+    else:
+        pub_date, pk = row.pub_date, row.pk
+    payload = json.dumps(
+        [direction, pub_date.isoformat(), pk, number],
+        separators=(',', ':'),
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Разбирает токен курсора, для битого токена возвращает None."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        direction, pub_date, pk, number = json.loads(
+            base64.urlsafe_b64decode(padded.encode())
+        )
+        pub_date = parse_datetime(pub_date)
+        pk, number = int(pk), int(number)
+    except (binascii.Error, ValueError, TypeError, UnicodeDecodeError):
+        return None
+    if direction not in (FORWARD, BACKWARD) or pub_date is None:
+        return None
+    # Число вне диапазона целых базы уронит запрос OverflowError.
+    if not (0 < pk <= MAX_ID and 0 < number <= MAX_ID):
+        return None
+    return direction, pub_date, pk, number
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинация по паре (pub_date, id).
+
+    Страница выбирается условием по ключу последней (или первой)
+    записи соседней страницы и LIMIT per_page + 1, без OFFSET и COUNT(*),
+    поэтому тысячная страница стоит столько же, сколько первая.
+    Атрибуты Page (number, has_next, has_previous) сохраняют смысл,
+    чтобы шаблон пагинатора продолжал работать.
+    """
+    cursor_mode = True
+    ordering = ('-pub_date', '-pk')
+
+    def __init__(self, object_list, per_page, **kwargs):
+        super().__init__(object_list.order_by(*self.ordering), per_page,
+                         **kwargs)
+        self.number = 1
+        self.has_more = False
+        self.page_length = 0
+        self.next_cursor = None
+        self.previous_cursor = None
+
+    def _window(self, queryset, cursor, key='pk'):
+        """per_page + 1 записей queryset за курсором в порядке обхода:
+        вниз по (pub_date, key) вперёд и вверх назад."""
+        limit = self.per_page + 1
+        if cursor is None:
+            return queryset.order_by('-pub_date', f'-{key}')[:limit]
+        direction, pub_date, pk, _ = cursor
+        if direction == FORWARD:
+            return queryset.filter(
+                Q(pub_date__lt=pub_date)
+                | Q(pub_date=pub_date, **{f'{key}__lt': pk})
+            ).order_by('-pub_date', f'-{key}')[:limit]
+        return queryset.filter(
+            Q(pub_date__gt=pub_date)
+            | Q(pub_date=pub_date, **{f'{key}__gt': pk})
+        ).order_by('pub_date', key)[:limit]
+
+    def _rows(self, cursor):
+        direction = cursor[0] if cursor else FORWARD
+        rows = list(self._window(self.object_list, cursor))
+        if direction == BACKWARD:
+            rows.reverse()
+        return rows, direction
+
+    def get_page(self, cursor=None):
+        """Возвращает страницу по токену, битый токен ведёт на первую."""
+        cursor = decode_cursor(cursor)
+        rows, direction = self._rows(cursor)
+        overflow = len(rows) > self.per_page
+        if direction == BACKWARD and not overflow:
+            # Выше курсора записей не хватило на целую страницу,
+            # значит мы дошли до начала ленты.
+            cursor = None
+            rows, direction = self._rows(cursor)
+            overflow = len(rows) > self.per_page
+        if direction == FORWARD:
+            self.number = cursor[3] if cursor else 1
+            self.has_more = overflow
+            rows = rows[:self.per_page]
+        else:
+            self.number = max(cursor[3], 2)
+            self.has_more = True
+            rows = rows[-self.per_page:]
+        self.page_length = len(rows)
+        if rows and self.has_more:
+            self.next_cursor = encode_cursor(rows[-1], self.number + 1)
+        if rows and self.number > 1:
+            self.previous_cursor = encode_cursor(
+                rows[0], self.number - 1, BACKWARD
+            )
+        return Page(rows, self.number, self)
+
+    @property
+    def count(self):
+        """Число записей, известное без COUNT(*): до конца текущей страницы."""
+        return (
+            (self.number - 1) * self.per_page + self.page_length
+            + int(self.has_more)
+        )
+
+    @property
+    def num_pages(self):
+        return self.number + int(self.has_more)
+
 
+class TimelinePaginator(CursorPaginator):
+    """Лента подписок user с keyset-пагинацией по TimelineEntry.
 
-def paginate_page(request, posts):
-    paginator = Paginator(posts, settings.NUMBER_POSTS)
+    Ключи страницы берутся из индекса (user, pub_date, post) записей
+    ленты и из постов популярных авторов, которые не рассылаются;
+    оба окна ограничены per_page + 1 строками и сливаются по ключу.
+    Посты читаются из object_list только для готовой страницы.
+    """
+
+    def __init__(self, object_list, user, per_page, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.user = user
+
+    def _rows(self, cursor):
+        direction = cursor[0] if cursor else FORWARD
+        entries = self._window(
+            TimelineEntry.objects.filter(user=self.user), cursor, 'post_id'
+        ).values_list('pub_date', 'post_id')
+        popular = self._window(
+            Post.objects.filter(author__in=popular_follows(self.user)),
+            cursor,
+        ).values_list('pub_date', 'pk')
+        keys = sorted(
+            set(entries) | set(popular), reverse=direction == FORWARD
+        )[:self.per_page + 1]
+        ids = [pk for _, pk in keys]
+        posts = {
+            row['id'] if isinstance(row, dict) else row.pk: row
+            for row in self.object_list.filter(pk__in=ids)
+        }
+        rows = [posts[pk] for pk in ids if pk in posts]
+        if direction == BACKWARD:
+            rows.reverse()
+        return rows, direction
+
+
+class CountedPaginator(Paginator):
+    """Пагинатор по номерам страниц с закэшированным числом записей.
+
+    count берётся из счётчика ленты вместо SELECT COUNT(*), если задан
+    count_key, а шаблону отдаётся только окно номеров вокруг текущей
+    страницы.
+    """
+
+    def __init__(self, object_list, per_page, count_key=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_key = count_key
+        self.visible_pages = range(0)
+
+    @cached_property
+    def count(self):
+        if self.count_key is None:
+            return self.object_list.count()
+        return get_feed_count(self.count_key, self.object_list)
+
+    def get_page(self, number):
+        page = super().get_page(number)
+        window = settings.PAGINATOR_WINDOW
+        self.visible_pages = range(
+            max(page.number - window, 1),
+            min(page.number + window, self.num_pages) + 1,
+        )
+        return page
+
+
+def paginate_page(request, posts, count_key=None):
+    """Keyset-пагинация, ?page= оставлен для совместимости со ссылками.
+
+    count_key задаёт счётчик ленты из posts.counters для режима ?page=.
+    """
     page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+    if page_number is not None:
+        if count_key is None:
+            paginator = Paginator(posts, settings.NUMBER_POSTS)
+        else:
+            paginator = CountedPaginator(
+                posts, settings.NUMBER_POSTS, count_key
+            )
+        return paginator.get_page(page_number)
+    paginator = CursorPaginator(posts, settings.NUMBER_POSTS)
+    return paginator.get_page(request.GET.get('cursor'))
+
+
+def timeline_page(request, posts, user):
+    """Лента подписок user: курсор идёт по TimelineEntry,
+    ?page= — по запросу PostQuerySet.timeline со счётчиком ленты."""
+    if request.GET.get('page') is not None:
+        return paginate_page(
+            request, posts.timeline(user), feed_key('follow', user.pk)
+        )
+    paginator = TimelinePaginator(posts, user, settings.NUMBER_POSTS)
+    return paginator.get_page(request.GET.get('cursor'))
+
+
+def load_threads(comments, depth):
+    """Раскладывает ответы на comments по веткам comment.thread.
+
+    Ответы читаются по запросу на уровень, не глубже depth уровней,
+    и только для комментариев, у которых они есть. У каждого
+    комментария раскрыто не больше COMMENT_REPLIES_PER_PAGE ответов,
+    а всего — не больше COMMENT_REPLIES_BUDGET, дальше уровни
+    не читаются. more_replies отмечает, что за раскрытыми ответами
+    есть ещё. Комментарий с reply_count и пустым thread показывается
+    свёрнутым.
+    """
+    limit = settings.COMMENT_REPLIES_PER_PAGE
+    budget = settings.COMMENT_REPLIES_BUDGET
+    by_pk = {}
+    for comment in comments:
+        comment.thread = []
+        comment.more_replies = False
+        by_pk[comment.pk] = comment
+    level = comments
+    for _ in range(depth):
+        parents = [comment for comment in level if comment.reply_count]
+        if not parents or not budget:
+            break
+        level = []
+        for reply in Comment.objects.first_replies(
+            parents, min(limit, budget) + 1
+        ).select_related('author'):
+            parent = by_pk[reply.parent_id]
+            if len(parent.thread) == limit or not budget:
+                parent.more_replies = bool(parent.thread)
+                continue
+            budget -= 1
+            reply.thread = []
+            reply.more_replies = False
+            parent.thread.append(reply)
+            by_pk[reply.pk] = reply
+            level.append(reply)
+    return comments
+
+
+def parse_id(value):
+    """Целый id из строки запроса, для мусора и чисел вне
+    диапазона первичного ключа — None."""
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    return value if 0 < value <= MAX_ID else None
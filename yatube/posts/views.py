@@ -1,28 +1,105 @@
+from urllib.parse import urlencode
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import render_to_string
+from django.urls import reverse
+
+from core.db import pin_primary, read_only_view
+from core.ratelimit import rate_limit
 
+from .cards import CardBatch
+from .counters import feed_key
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
-from .utils import paginate_page
+from .models import Comment, Follow, Group, Post, RankingScore, User
+from .page_cache import cache_anonymous_page, conditional_page
+from .ranking import in_order, ranked_ids
+from .search import search_posts
+from .utils import (CountedPaginator, CursorPaginator, load_threads,
+                    paginate_page, parse_id, timeline_page)
+
+
+def post_page_tags(post_id):
+    author = Post.objects.filter(pk=post_id).values_list(
+        'author__username', flat=True
+    ).order_by().first()
+    return (f'post:{post_id}', f'author:{author}', 'groups')
+
+
+def index_page_tags():
+    return ('posts', 'groups')
+
+
+def group_page_tags(slug):
+    return (f'group:{slug}', 'groups')
+
+
+def profile_page_tags(username):
+    return (f'author:{username}', 'groups')
 
 
+@conditional_page(index_page_tags)
+@cache_anonymous_page(index_page_tags)
+@read_only_view
 def index(request):
     """Главная страница"""
     template = "posts/index.html"
-    post_list = Post.objects.all()
-    page_obj = paginate_page(request, post_list)
+    post_list = Post.objects.feed()
+    page_obj = paginate_page(request, post_list, feed_key('index'))
     context = {
         'page_obj': page_obj,
     }
     return render(request, template, context)
 
 
+@read_only_view
+def search(request):
+    """Поиск по постам и комментариям"""
+    query = request.GET.get('q', '').strip()
+    posts = search_posts(Post.objects.feed(), query)
+    paginator = CountedPaginator(posts, settings.NUMBER_POSTS)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@read_only_view
+def popular(request):
+    """Популярные посты и группы"""
+    paginator = Paginator(ranked_ids(RankingScore.POST),
+                          settings.NUMBER_POSTS)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    page_obj.object_list = in_order(Post.objects.feed(),
+                                    page_obj.object_list)
+    groups = in_order(
+        Group.objects.all(),
+        ranked_ids(RankingScore.GROUP)[:settings.RANKING_GROUPS],
+    )
+    context = {
+        'page_obj': page_obj,
+        'groups': groups,
+    }
+    return render(request, 'posts/popular.html', context)
+
+
+@conditional_page(group_page_tags)
+@cache_anonymous_page(group_page_tags)
+@read_only_view
 def group_posts(request, slug):
     """Страница группы"""
     template = "posts/group_list.html"
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    page_obj = paginate_page(request, post_list)
+    post_list = group.posts.feed()
+    page_obj = paginate_page(
+        request, post_list, feed_key('group', group.pk)
+    )
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -30,12 +107,17 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+@conditional_page(profile_page_tags)
+@cache_anonymous_page(profile_page_tags)
+@read_only_view
 def profile(request, username):
     """Профайл пользователя"""
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    page_obj = paginate_page(request, posts)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    posts = author.posts.profile()
+    page_obj = paginate_page(request, posts, feed_key('author', author.pk))
     following = (
         request.user.is_authenticated
         and author.following.filter(user=request.user).exists()
@@ -48,10 +130,88 @@ def profile(request, username):
     return render(request, template, context)
 
 
+def comments_page(request, post):
+    """Страница тредов поста: не больше COMMENTS_PER_PAGE корневых
+    комментариев с ответами, следующая выбирается по курсору ?cursor=."""
+    paginator = CursorPaginator(
+        post.comments.roots().select_related('author'),
+        settings.COMMENTS_PER_PAGE,
+    )
+    page = paginator.get_page(request.GET.get('cursor'))
+    load_threads(page.object_list, settings.COMMENT_THREAD_DEPTH)
+    return page
+
+
+def render_comments(request, comments, next_url=None):
+    return JsonResponse({
+        'html': render_to_string(
+            'posts/includes/comment_list.html',
+            {'comments': comments},
+            request,
+        ),
+        'next': next_url,
+    })
+
+
+@cache_anonymous_page(post_page_tags)
+@read_only_view
+def post_comments(request, post_id):
+    """Следующая страница комментариев для кнопки «Показать ещё»:
+    HTML комментариев и адрес следующей страницы."""
+    post = get_object_or_404(Post, id=post_id)
+    comments = comments_page(request, post)
+    next_url = None
+    if comments.has_next():
+        next_url = '{}?{}'.format(
+            reverse('posts:post_comments', args=[post.pk]),
+            urlencode({'cursor': comments.paginator.next_cursor}),
+        )
+    return render_comments(request, comments, next_url)
+
+
+@cache_anonymous_page(
+    lambda post_id, comment_id: post_page_tags(post_id)
+)
+@read_only_view
+def comment_thread(request, post_id, comment_id):
+    """Свёрнутая ветка: COMMENT_REPLIES_PER_PAGE ответов на комментарий
+    после ответа ?after= с их ветками на COMMENT_THREAD_DEPTH уровней
+    вниз и адрес следующей порции."""
+    comment = get_object_or_404(Comment, pk=comment_id, post_id=post_id)
+    limit = settings.COMMENT_REPLIES_PER_PAGE
+    replies = comment.replies.select_related('author').order_by('pk')
+    after = parse_id(request.GET.get('after'))
+    if after is not None:
+        replies = replies.filter(pk__gt=after)
+    replies = list(replies[:limit + 1])
+    next_url = None
+    if len(replies) > limit:
+        replies = replies[:limit]
+        next_url = '{}?{}'.format(
+            reverse('posts:comment_thread', args=[post_id, comment.pk]),
+            urlencode({'after': replies[-1].pk}),
+        )
+    load_threads(replies, settings.COMMENT_THREAD_DEPTH - 1)
+    return render_comments(request, replies, next_url)
+
+
+@read_only_view
+def post_card(request, post_id):
+    """Карточка одного поста для ленты, которую дополняет поток
+    событий о новых постах (posts.events)."""
+    post = get_object_or_404(Post.objects.feed(), pk=post_id)
+    return HttpResponse(CardBatch([post]).render(post))
+
+
+@conditional_page(post_page_tags)
+@cache_anonymous_page(post_page_tags)
+@read_only_view
 def post_detail(request, post_id):
     """Просмотр записи"""
-    post = get_object_or_404(Post, id=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.detail(), id=post_id
+    )
+    comments = comments_page(request, post)
     form = CommentForm()
     template = 'posts/post_detail.html'
     context = {
@@ -62,7 +222,9 @@ def post_detail(request, post_id):
     return render(request, template, context)
 
 
+@rate_limit('post_create')
 @login_required
+@pin_primary
 def post_create(request):
     """Создание поста"""
     template = 'posts/create_post.html'
@@ -82,6 +244,7 @@ def post_create(request):
 
 
 @login_required
+@pin_primary
 def post_edit(request, post_id):
     """Редактирование поста"""
     post = get_object_or_404(Post, pk=post_id)
@@ -103,7 +266,9 @@ def post_edit(request, post_id):
     return render(request, 'posts/create_post.html', context)
 
 
+@rate_limit('add_comment')
 @login_required
+@pin_primary
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
@@ -111,19 +276,23 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
+        parent_id = parse_id(request.POST.get('parent'))
+        if parent_id is not None:
+            comment.parent = get_object_or_404(post.comments, pk=parent_id)
         comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
+@read_only_view
 def follow_index(request):
-    posts = Post.objects.filter(
-        author__following__user=request.user)
-    pagin = paginate_page(request, posts)
+    pagin = timeline_page(request, Post.objects.feed(), request.user)
     return render(request, 'posts/follow.html', context={'page_obj': pagin})
 
 
+@rate_limit('follow', methods=None)
 @login_required
+@pin_primary
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if author != request.user:
@@ -131,7 +300,9 @@ def profile_follow(request, username):
     return redirect('posts:profile', author)
 
 
+@rate_limit('follow', methods=None)
 @login_required
+@pin_primary
 def profile_unfollow(request, username):
     user_follower = Follow.objects.filter(
         author__username=username,
@@ -0,0 +1,36 @@
+"""
+ASGI config for yatube project.
+
+Serves the Django views through thread pools and the Server-Sent Events
+stream (posts.events) from the same process, so the in-process
+broadcast of new posts reaches its subscribers. Read-only views
+(feeds, post pages, the JSON API) get their own pool of
+ASGI_READ_THREADS threads, everything else runs in ASGI_THREADS.
+Run with any ASGI server, e.g. ``uvicorn yatube.asgi:application``.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+django.setup(set_prefix=False)
+
+from core.asgi import ReadPoolWsgiToAsgi, Router  # noqa: E402
+from posts import events  # noqa: E402
+
+application = Router(
+    [(events.EVENTS_PREFIX, events.application)],
+    default=ReadPoolWsgiToAsgi(
+        WSGIHandler(),
+        read_executor=ThreadPoolExecutor(
+            settings.ASGI_READ_THREADS, thread_name_prefix='asgi-read'
+        ),
+        executor=ThreadPoolExecutor(
+            settings.ASGI_THREADS, thread_name_prefix='asgi'
+        ),
+    ),
+)
@@ -93,13 +93,57 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# PRAGMAS выполняются на каждом новом соединении SQLite (core.db).
+# WAL позволяет читать ленты, пока пишутся посты и комментарии;
+# synchronous=NORMAL в WAL не теряет целостность при сбое процесса,
+# busy_timeout ждёт освобождения блокировки записи вместо ошибки.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -64 * 1024,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+# Соединения переживают запрос: CONN_MAX_AGE секунд в потоке, который
+# их открыл, а с POOL_SIZE > 0 ещё и в пуле процесса для новых потоков
+# (core.backends.sqlite3). CONN_HEALTH_CHECKS проверяет сохранённое
+# соединение перед запросом и переоткрывает его, если оно не отвечает.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'PRAGMAS': SQLITE_PRAGMAS,
+        'CONN_MAX_AGE': int(os.environ.get('YATUBE_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS':
+            os.environ.get('YATUBE_CONN_HEALTH_CHECKS', '1') != '0',
+        'POOL_SIZE': int(os.environ.get('YATUBE_DB_POOL_SIZE', 0)),
     }
 }
 
+# Базы только для чтения для вьюх лент (core.db.read_only_view):
+# YATUBE_FEED_READONLY=1 добавляет соединения query_only к той же базе,
+# YATUBE_REPLICAS — реплики через запятую, для SQLite это копии файла
+# (manage.py sync_sqlite_replicas). После записи пользователь
+# REPLICA_PIN_SECONDS секунд читает из default.
+READ_DATABASES = []
+if os.environ.get('YATUBE_FEED_READONLY'):
+    READ_DATABASES.append('feed')
+    DATABASES['feed'] = {**DATABASES['default']}
+for number, name in enumerate(
+    filter(None, os.environ.get('YATUBE_REPLICAS', '').split(',')), 1
+):
+    READ_DATABASES.append(f'replica{number}')
+    DATABASES[f'replica{number}'] = {**DATABASES['default'], 'NAME': name}
+for alias in READ_DATABASES:
+    DATABASES[alias].update({
+        'PRAGMAS': {**SQLITE_PRAGMAS, 'query_only': 'ON'},
+        'TEST': {'MIRROR': 'default'},
+    })
+REPLICA_PIN_SECONDS = 5
+DATABASE_ROUTERS = ['core.db.ReadOnlyViewRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -147,10 +191,41 @@ INTERNAL_IPS = [
     '127.0.0.1',
 ]
 
+# Версии тегов страниц, счётчики лент, ведра лимитов и статистика
+# должны быть общими для всех процессов: с LocMemCache запись в одном
+# воркере не сбрасывает страницы, закэшированные в другом. LocMemCache
+# годится только для одного процесса (runserver, один воркер ASGI),
+# для нескольких воркеров задайте общий бэкенд через окружение, его
+# требует check --deploy (core.checks). Команды *_stats читают счётчики
+# из своего процесса и без общего кэша завершаются ошибкой (core.stats).
+# Целые ответы лежат в отдельном кэше pages, чтобы не вытеснять ключи
+# тегов.
+CACHE_BACKEND = os.environ.get(
+    'YATUBE_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+)
+CACHE_LOCATION = os.environ.get('YATUBE_CACHE_LOCATION', '')
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': CACHE_BACKEND,
+        # У LocMemCache LOCATION разделяет хранилища внутри процесса.
+        'LOCATION': CACHE_LOCATION or 'default',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'pages': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': CACHE_LOCATION or 'pages',
+        'KEY_PREFIX': 'pages',
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+}
+
+# Ведра токенов для пишущих view (core.ratelimit): (burst, period) —
+# столько запросов подряд, и столько же восстанавливается за period
+# секунд. Счёт ведётся на пользователя, для анонимов — на IP.
+RATE_LIMITS = {
+    'post_create': (5, 60),
+    'add_comment': (10, 60),
+    'follow': (20, 60),
 }
 
 MEDIA_URL = '/media/'
@@ -158,6 +233,76 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# Загрузки больше POST_IMAGE_MAX_SIZE отбрасываются по мере чтения
+# запроса, как и картинки больше POST_IMAGE_MAX_PIXELS по заголовку;
+# файлы больше FILE_UPLOAD_MAX_MEMORY_SIZE пишутся на диск кусками.
+# PostForm убирает из принятой картинки метаданные.
+FILE_UPLOAD_HANDLERS = [
+    'posts.uploads.ImageUploadLimitHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+POST_IMAGE_MAX_SIZE = 10 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 40 * 10 ** 6
+
+# Миниатюры режет воркер `manage.py thumbnail_worker`, страница до
+# готовности показывает заглушку. Размеры выводит тег post_image вместе
+# с производными для srcset: ширины не больше ширины размера, форматы
+# в порядке предпочтения в <picture>. Картинка, которую не удалось
+# нарезать за THUMBNAIL_MAX_ATTEMPTS попыток, показывается без миниатюры.
+THUMBNAIL_BACKEND = 'posts.thumbnails.DeferredThumbnailBackend'
+THUMBNAIL_WORKERS = 2
+THUMBNAIL_BATCH_SIZE = 50
+THUMBNAIL_POLL_INTERVAL = 1
+THUMBNAIL_MAX_ATTEMPTS = 3
+POST_THUMBNAILS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+    'detail': ('960x339', {'crop': 'center', 'upscale': False}),
+}
+POST_IMAGE_WIDTHS = (480, 720, 960)
+POST_IMAGE_FORMATS = ('WEBP', 'JPEG')
+
+# Поиск по постам. SQLiteFTSBackend работает только на SQLite, для
+# других баз нужен свой бэкенд или LikeSearchBackend без индекса.
+POST_SEARCH_BACKEND = 'posts.search.SQLiteFTSBackend'
+POST_SEARCH_MAX_WORDS = 10
+
+# События о новых постах для SSE (posts.events, yatube.asgi).
+POST_BROADCAST_BACKEND = 'posts.broadcast.LocalBroadcast'
+POST_BROADCAST_QUEUE_SIZE = 100
+SSE_KEEPALIVE_SECONDS = 15
+# Потоки yatube.asgi: для read_only_view и для остальных view.
+ASGI_READ_THREADS = int(os.environ.get('YATUBE_ASGI_READ_THREADS', 8))
+ASGI_THREADS = int(os.environ.get('YATUBE_ASGI_THREADS', 4))
+# Тело запроса под ASGI читается до Django: картинка и поля формы
+# (DATA_UPLOAD_MAX_MEMORY_SIZE по умолчанию). Больше — ответ 413.
+ASGI_MAX_BODY_SIZE = POST_IMAGE_MAX_SIZE + 2_621_440
+
 NUMBER_POSTS = 10
+PAGINATOR_WINDOW = 3
+COMMENTS_PER_PAGE = 20
+# Ответы глубже COMMENT_MAX_DEPTH становятся соседями, на странице поста
+# треды раскрыты на COMMENT_THREAD_DEPTH уровней, дальше — по кнопке.
+# У комментария видно COMMENT_REPLIES_PER_PAGE ответов, на всей порции
+# комментариев — COMMENT_REPLIES_BUDGET, остальные — тоже по кнопке.
+COMMENT_MAX_DEPTH = 8
+COMMENT_THREAD_DEPTH = 3
+COMMENT_REPLIES_PER_PAGE = 10
+COMMENT_REPLIES_BUDGET = 100
+FEED_COUNT_TIMEOUT = 60 * 5
+TIMELINE_FANOUT_LIMIT = 1000
+# Страницы живут в кэше pages; при LocMemCache это верно только
+# для одного процесса (см. CACHES).
+PAGE_CACHE_TIMEOUT = 60 * 10
+# «Популярное»: очки событий вдвое затухают за RANKING_HALF_LIFE секунд,
+# refresh_rankings запускается по расписанию чаще RANKING_TIMEOUT.
+RANKING_HALF_LIFE = 60 * 60 * 6
+RANKING_WEIGHTS = {'comment': 1.0, 'follow': 3.0}
+RANKING_MIN_SCORE = 0.05
+RANKING_SIZE = 100
+RANKING_GROUPS = 10
+RANKING_TIMEOUT = 60 * 15
+POST_CARD_TIMEOUT = 60 * 60 * 24
+TIMELINE_BATCH_SIZE = 500
 POST_COUNT = 10
 POST_COUNT_FOR_TEST = 13